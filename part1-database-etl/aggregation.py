@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from defaults import DEFAULT_GROUP_ROWS
+from schema import TABLE_DTYPES
+
+# Bounded-memory aggregation of cleaned sales rows into orders.
+#
+# A single groupby over the whole deduplicated sales frame is where
+# transform_sales peaks: the three group keys (one of them the order_date
+# strings) are factorized and sorted for every row at once, and the result
+# is copied several times in its wide raw dtypes before being compacted.
+#
+# aggregate_orders is a sort-based streaming group-by instead. The rows
+# that have all three keys are put in transaction_id order (a stable
+# argsort, 8 bytes per row) and grouped group_rows at a time, never
+# splitting a transaction across two slices. Slices follow each other in
+# transaction_id order and each order's rows keep their input order, so
+# every slice gives exactly the orders a single groupby finds for those
+# transactions (same float sums, same first status), already in groupby
+# order. Each slice is cast to the compact orders dtypes right away (see
+# schema.TABLE_DTYPES), so the grouping itself only ever holds one slice,
+# and only the compact result grows with the input.
+#
+# This is not out-of-core: only the groupby's working memory is bounded.
+# The whole deduplicated sales frame still has to be in memory, with its
+# order_date and subtotal columns, plus the argsort over it (positions and
+# sorted IDs, 16 bytes per row). Nothing is spilled to disk. When the sales
+# themselves don't fit, --chunk-size streams them instead (see
+# etl_pipeline.stream_sales). benchmark_aggregation.py reports peaks with
+# the input frame included.
+
+ORDER_KEYS = ['transaction_id', 'customer_id', 'order_date']
+
+# Columns of the sales rows that orders are built from
+ORDER_COLUMNS = ORDER_KEYS + ['subtotal', 'status']
+
+
+def transaction_order(df):
+    """(positions of the rows that have every group key, their transaction IDs), sorted on transaction_id
+
+    Rows with a missing key are left out, as groupby leaves them out. The
+    sort is stable, so rows of the same transaction keep their input order.
+    """
+    complete = np.ones(len(df), dtype=bool)
+    for key in ORDER_KEYS:
+        complete &= df[key].notna().to_numpy()
+    positions = np.flatnonzero(complete)
+    ids = df['transaction_id'].take(positions).to_numpy(dtype=np.float64)
+    order = np.argsort(ids, kind='stable')
+    positions = positions[order]
+    return positions, ids[order]
+
+
+def concat_slices(parts):
+    """One frame from consecutive slices, categorical columns united under their sorted categories
+
+    Sorted categories are what astype('category') gives the whole column.
+    Columns are popped off the slices as they are joined, so only one
+    column is ever held twice. The slices are left empty.
+    """
+    columns = {}
+    for column in list(parts[0].columns):
+        pieces = [part.pop(column) for part in parts]
+        if isinstance(pieces[0].dtype, pd.CategoricalDtype):
+            columns[column] = union_categoricals(pieces, sort_categories=True)
+        else:
+            columns[column] = pd.concat(pieces, ignore_index=True)
+        del pieces
+    return pd.DataFrame(columns)
+
+
+def aggregate_orders(df, build_orders, group_rows=DEFAULT_GROUP_ROWS):
+    """Orders of cleaned sales rows (with subtotal), grouped group_rows rows at a time
+
+    Same orders as apply_table_dtypes(build_orders(df), 'orders').
+    build_orders (see etl_pipeline.build_orders) runs once per slice.
+    Returns (orders, number of slices).
+    """
+    positions, ids = transaction_order(df)
+    dtypes = TABLE_DTYPES['orders']
+
+    parts = []
+    start = 0
+    # (an empty frame still makes one empty slice, so the columns and dtypes are there)
+    while start < len(positions) or not parts:
+        end = min(start + group_rows, len(positions))
+        if end < len(positions):
+            # Never split a transaction: the rest of its rows join this slice
+            end = int(np.searchsorted(ids, ids[end - 1], side='right'))
+        # Column by column: a row-and-column iloc copies the columns whole first
+        rows = pd.DataFrame({column: df[column].take(positions[start:end]) for column in ORDER_COLUMNS})
+        orders = build_orders(rows)
+        parts.append(orders.astype(dtypes))
+        start = end
+    del positions, ids
+
+    return concat_slices(parts), len(parts)
@@ -0,0 +1,161 @@
+"""Memory and time of transform_sales with one orders groupby and with orders grouped a slice at a time
+
+For each size the raw files are generated (see generate_data.py, kept in
+--data-dir like benchmark_pipeline.py does) and transform_sales runs on
+the whole sales file in a fresh subprocess per mode, so peaks don't mix:
+
+  groupby   build_orders over the whole deduplicated frame (the default)
+  sliced    aggregation.aggregate_orders: rows in transaction_id order,
+            grouped --group-rows at a time (etl_pipeline.py --group-rows)
+
+Neither mode is out-of-core: both hold the whole sales frame, and sliced
+mode only bounds the groupby's working memory (see aggregation.py). So
+every peak shown includes the input. Shown per run: the time, RSS once
+the raw file is read, the peak RSS of the transform (instrument.measure
+resets the peak when it starts, the raw frame is resident throughout),
+the peak RSS of the whole subprocess (reading the file included), and
+what the transform added on top of the raw frame. The transform peaks in
+other steps too (deduplication, order items), so the orders step is also
+measured on its own in a second subprocess. That figure is the deep size
+of the sales frame it groups plus the peak of Python allocations
+(tracemalloc) while it runs: build_orders in groupby mode,
+aggregate_orders in sliced mode. Both modes must produce the same orders
+and order items (compared by content hash).
+
+Usage: python benchmark_aggregation.py [--rows 1m 5m] [--group-rows 100000]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmark_pipeline import dataset_dir, DEFAULT_DATA_DIR
+from defaults import DEFAULT_GROUP_ROWS
+from generate_data import parse_size
+
+MODES = ['groupby', 'sliced']
+
+
+def rss_mb():
+    """Current resident memory of this process in MB (Linux), None elsewhere"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def content_hash(*frames):
+    """Hash of the rows, row order and dtypes of the frames"""
+    digest = hashlib.sha256()
+    for frame in frames:
+        digest.update(pd.util.hash_pandas_object(frame).to_numpy().tobytes())
+        digest.update(str(frame.dtypes.to_dict()).encode())
+    return digest.hexdigest()[:16]
+
+
+def trace_orders_step(mode, record):
+    """Make the orders step of transform_sales record its peak (MB) in record['peak_mb']
+
+    The peak is the deep size of the sales frame it is given plus the peak
+    of the allocations it makes (tracemalloc).
+    """
+    import aggregation
+    import etl_pipeline
+    from schema import memory_mb
+
+    module, name = (etl_pipeline, 'build_orders') if mode == 'groupby' else (aggregation, 'aggregate_orders')
+    step = getattr(module, name)
+
+    def traced(df, *args, **kwargs):
+        input_mb = memory_mb(df)
+        tracemalloc.start()
+        try:
+            return step(df, *args, **kwargs)
+        finally:
+            record['peak_mb'] = input_mb + tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            tracemalloc.stop()
+
+    setattr(module, name, traced)
+
+
+def run_orders_step(mode, path, group_rows):
+    """Run transform_sales once in this process and print the orders step's peak in MB, input included"""
+    import etl_pipeline
+    from staging import read_source_csv
+
+    sales = read_source_csv(path)
+    record = {}
+    trace_orders_step(mode, record)
+    with contextlib.redirect_stdout(io.StringIO()):
+        etl_pipeline.transform_sales(sales, group_rows if mode == 'sliced' else None)
+    print(record['peak_mb'])
+
+
+def run_one(mode, path, group_rows):
+    """Run transform_sales once in this process and print 'seconds rss_before_mb peak_mb run_peak_mb hash'"""
+    import etl_pipeline
+    from instrument import measure
+    from staging import read_source_csv
+    from streaming import peak_rss_mb
+
+    sales = read_source_csv(path)
+    before = rss_mb()
+    # The transform's measure() resets the peak, so keep the reading's first
+    read_peak = peak_rss_mb()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), measure('transform_sales') as record:
+        orders, order_items, _ = etl_pipeline.transform_sales(sales, group_rows if mode == 'sliced' else None)
+    seconds = time.perf_counter() - start
+    run_peak = max(read_peak, record['peak_rss_mb'])
+    print(f"{seconds} {before} {record['peak_rss_mb']} {run_peak} {content_hash(orders, order_items)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=parse_size, nargs='+', default=[parse_size('1m')],
+                        help="sales rows, numbers or 10k / 1m / 50m (default: 1m)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--group-rows', type=int, default=DEFAULT_GROUP_ROWS,
+                        help=f"sales rows per slice in sliced mode (default: {DEFAULT_GROUP_ROWS})")
+    parser.add_argument('--run', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    parser.add_argument('--orders-step', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        (run_orders_step if args.orders_step else run_one)(args.run[0], args.run[1], args.group_rows)
+        return
+
+    print(f"{'rows':>12} {'mode':>8} {'time (s)':>9} {'raw MB':>8} {'peak MB':>8} {'run peak MB':>12} {'added MB':>9} "
+          f"{'orders+input MB':>16}")
+    print("-" * 89)
+    for rows in args.rows:
+        path = os.path.join(dataset_dir(args.data_dir, rows, args.seed), 'sales_raw.csv')
+        hashes = {}
+        for mode in MODES:
+            command = [sys.executable, __file__, '--run', mode, path, '--group-rows', str(args.group_rows)]
+            result = subprocess.run(command, check=True, capture_output=True, text=True)
+            seconds, before, peak, run_peak, hashes[mode] = result.stdout.split()
+            seconds, before, peak, run_peak = float(seconds), float(before), float(peak), float(run_peak)
+            result = subprocess.run(command + ['--orders-step'], check=True, capture_output=True, text=True)
+            orders_peak = float(result.stdout)
+            print(f"{rows:>12,} {mode:>8} {seconds:>9.2f} {before:>8.1f} {peak:>8.1f} {run_peak:>12.1f} "
+                  f"{peak - before:>9.1f} {orders_peak:>16.1f}")
+        if len(set(hashes.values())) != 1:
+            raise AssertionError(f"{rows:,} rows: the modes produced different orders / order items")
+    print("\n✓ Same orders and order items with every mode")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare rows/second of each bulk-load strategy against plain DataFrame.to_sql
+
+Loads generated customers/products/orders/order_items frames into a fresh
+SQLite file per run (or into --database-url, which is dropped and reloaded).
+
+Usage: python benchmark_bulk_load.py [--rows 100000] [--batch-size 10000] [--database-url URL]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from bulk_load import bulk_load, engine_options, LOAD_STRATEGIES
+
+
+def make_frames(rows, seed=42):
+    """Clean, referentially valid frames shaped like the transform output"""
+    rng = np.random.default_rng(seed)
+    customers = max(rows // 10, 1)
+    products = max(rows // 100, 1)
+
+    customers_df = pd.DataFrame({
+        'customer_id': np.arange(1, customers + 1),
+        'first_name': 'First',
+        'last_name': 'Last',
+        'email': [f'customer{i}@example.com' for i in range(1, customers + 1)],
+        'phone': '+91-9876543210',
+        'city': np.array(['Bangalore', 'Mumbai', 'Delhi'])[rng.integers(0, 3, customers)],
+        'registration_date': '2023-01-15',
+    })
+    products_df = pd.DataFrame({
+        'product_id': np.arange(1, products + 1),
+        'product_name': [f'Product {i}' for i in range(1, products + 1)],
+        'category': np.array(['Electronics', 'Fashion', 'Groceries'])[rng.integers(0, 3, products)],
+        'price': rng.integers(100, 100_000, products).astype(float),
+        'stock_quantity': rng.integers(0, 500, products),
+    })
+    orders_df = pd.DataFrame({
+        'order_id': np.arange(1, rows + 1),
+        'customer_id': rng.integers(1, customers + 1, rows),
+        'order_date': '2024-01-15',
+        'total_amount': rng.integers(100, 100_000, rows).astype(float),
+        'status': np.array(['Completed', 'Pending', 'Cancelled'])[rng.integers(0, 3, rows)],
+    })
+    quantity = rng.integers(1, 10, rows)
+    unit_price = rng.integers(100, 100_000, rows).astype(float)
+    order_items_df = pd.DataFrame({
+        'order_item_id': np.arange(1, rows + 1),
+        'order_id': np.arange(1, rows + 1),
+        'product_id': rng.integers(1, products + 1, rows),
+        'quantity': quantity,
+        'unit_price': unit_price,
+        'subtotal': quantity * unit_price,
+    })
+
+    return {'customers': customers_df, 'products': products_df, 'orders': orders_df, 'order_items': order_items_df}
+
+
+def load_with_to_sql(engine, frames):
+    """The old LOAD phase: default to_sql, one table at a time"""
+    for table, df in frames.items():
+        df.to_sql(table, engine, if_exists='replace', index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000, help="orders and order items to load")
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    frames = make_frames(args.rows)
+    total_rows = sum(len(df) for df in frames.values())
+
+    print(f"Loading {total_rows:,} rows across {len(frames)} tables (batch size {args.batch_size})")
+    print(f"{'strategy':>12} {'time (s)':>10} {'rows/s':>12}")
+    print("-" * 36)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for strategy in ['to_sql'] + list(LOAD_STRATEGIES):
+            url = args.database_url or f"sqlite:///{os.path.join(tmp, f'{strategy}.db')}"
+            engine = create_engine(url, **engine_options(strategy, url))
+
+            start = time.perf_counter()
+            if strategy == 'to_sql':
+                load_with_to_sql(engine, frames)
+            else:
+                bulk_load(engine, frames, strategy=strategy, batch_size=args.batch_size)
+            elapsed = time.perf_counter() - start
+
+            with engine.connect() as conn:
+                loaded = sum(conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() for table in frames)
+            assert loaded == total_rows, f"{strategy} loaded {loaded} of {total_rows} rows"
+            engine.dispose()
+
+            print(f"{strategy:>12} {elapsed:>10.2f} {total_rows / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
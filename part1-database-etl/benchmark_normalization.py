@@ -0,0 +1,88 @@
+"""Benchmark old per-row .apply cleanup against the vectorized normalization module
+
+Usage: python benchmark_normalization.py [--sizes 10000 1000000 10000000]
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from normalization import extract_numeric_ids, standardize_phones
+
+
+# Old per-row implementations (as they were in etl_pipeline.py)
+def extract_numeric_id(id_value):
+    if pd.isna(id_value):
+        return None
+    numeric_part = re.sub(r'\D', '', str(id_value))
+    return int(numeric_part) if numeric_part else None
+
+
+def standardize_phone(phone):
+    if pd.isna(phone):
+        return None
+    digits = re.sub(r'\D', '', str(phone))
+    if len(digits) == 10:
+        return f'+91-{digits}'
+    elif len(digits) > 10:
+        return f'+91-{digits[-10:]}'
+    return phone
+
+
+def make_id_column(rows, prefix, distinct, rng):
+    ids = pd.Series(np.char.add(prefix, rng.integers(1, distinct + 1, rows).astype(str)), dtype=object)
+    ids[rng.random(rows) < 0.05] = None
+    return ids
+
+
+def make_columns(rows, seed=42):
+    """Build ID and phone columns with the same kind of dirt as the raw CSVs"""
+    rng = np.random.default_rng(seed)
+
+    # Transaction IDs are mostly unique, customer IDs repeat across sales
+    transaction_ids = make_id_column(rows, 'T', rows, rng)
+    customer_ids = make_id_column(rows, 'C', max(rows // 100, 1), rng)
+
+    numbers = rng.integers(6 * 10**9, 10**10, rows).astype(str)
+    prefixes = np.array(['', '+91-', '0', '+91 '])[rng.integers(0, 4, rows)]
+    phones = pd.Series(np.char.add(prefixes, numbers), dtype=object)
+    phones[rng.random(rows) < 0.05] = None
+
+    return transaction_ids, customer_ids, phones
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'column':>8} {'apply (s)':>12} {'vectorized (s)':>16} {'speedup':>9}")
+    print("-" * 61)
+
+    for rows in args.sizes:
+        transaction_ids, customer_ids, phones = make_columns(rows)
+
+        for name, column, old, new in [
+            ('txn_id', transaction_ids, extract_numeric_id, extract_numeric_ids),
+            ('cust_id', customer_ids, extract_numeric_id, extract_numeric_ids),
+            ('phone', phones, standardize_phone, standardize_phones),
+        ]:
+            old_result, old_time = timed(lambda: column.apply(old))
+            new_result, new_time = timed(lambda: new(column))
+
+            # Both paths must produce exactly the same column
+            pd.testing.assert_series_equal(old_result, new_result)
+
+            print(f"{rows:>12,} {name:>8} {old_time:>12.3f} {new_time:>16.3f} {old_time / new_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
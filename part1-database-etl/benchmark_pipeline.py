@@ -0,0 +1,203 @@
+"""Run the whole ETL pipeline on generated data against SQLite and track time and peak RSS per stage over time
+
+For each size the raw files are generated (see generate_data.py; reused
+from --data-dir when already there for the same size and seed) and
+etl_pipeline.py runs on them in a fresh subprocess with a fresh SQLite
+file. Its run record (see instrument.py) gives wall time and peak RSS per
+stage, summed up per phase: extract, transform, validate, load.
+
+Every run is appended as one JSON line to --history, and compared with the
+last run of the same size and options found there: phases more than
+--tolerance slower, or using that much more memory, are flagged (and make
+the exit status 1 with --fail-on-regression).
+
+Usage: python benchmark_pipeline.py [--sizes 10k 1m] [--chunk-size 1000000] [--history pipeline_benchmark.jsonl]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from generate_data import generate_dataset, parse_size
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_DIR = '.bench_data'
+DEFAULT_HISTORY = 'pipeline_benchmark.jsonl'
+
+# Phase: stage names (or name prefixes) of the run record that belong to it
+PHASES = {
+    'extract': ['extract_'],
+    'transform': ['transform_'],
+    'validate': ['validate'],
+    'load': ['create_tables', 'load_', 'create_indexes'],
+}
+
+
+def phase_of(stage):
+    for phase, names in PHASES.items():
+        if any(stage == name or (name.endswith('_') and stage.startswith(name)) for name in names):
+            return phase
+    return None
+
+
+def dataset_dir(data_dir, rows, seed):
+    """Directory with the raw files for rows sales, generated there on first use"""
+    path = os.path.join(data_dir, f'{rows}_seed{seed}')
+    marker = os.path.join(path, 'generated.json')
+    if not os.path.exists(marker):
+        start = time.perf_counter()
+        counts = generate_dataset(path, rows, seed)
+        with open(marker, 'w') as f:
+            json.dump({'rows': rows, 'seed': seed, 'files': counts}, f)
+        print(f"  generated {rows:,} sales in {time.perf_counter() - start:.1f}s -> {path}")
+    return path
+
+
+def run_pipeline(data_path, pipeline_args):
+    """Run etl_pipeline.py on the files of data_path, returns (elapsed seconds, run record)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        run_record = os.path.join(tmp, 'run_record.json')
+        command = [sys.executable, os.path.join(HERE, 'etl_pipeline.py'),
+                   '--database-url', f"sqlite:///{os.path.join(tmp, 'fleximart.db')}",
+                   '--run-record', run_record,
+                   '--reject-file', os.path.join(tmp, 'rejected_rows.parquet')] + pipeline_args
+        start = time.perf_counter()
+        # The pipeline reads the raw files from, and writes its text report to, its working directory
+        subprocess.run(command, cwd=data_path, check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        with open(run_record) as f:
+            return elapsed, json.load(f)
+
+
+def summarize(rows, seed, options, elapsed, run_record):
+    """History entry of one run: per-phase and per-stage wall time and peak RSS"""
+    stages, phases = {}, {}
+    for record in run_record['stages']:
+        if record['parent'] is not None:
+            continue
+        stages[record['stage']] = {'wall_s': record['wall_s'], 'peak_rss_mb': record['peak_rss_mb'],
+                                   'rows_per_s': record['rows_per_s']}
+        phase = phase_of(record['stage'])
+        if phase:
+            totals = phases.setdefault(phase, {'wall_s': 0.0, 'peak_rss_mb': 0.0})
+            totals['wall_s'] += record['wall_s']
+            totals['peak_rss_mb'] = max(totals['peak_rss_mb'], record['peak_rss_mb'] or 0)
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'rows': rows,
+        'seed': seed,
+        'options': options,
+        'success': run_record['success'],
+        'elapsed_s': elapsed,
+        'peak_rss_mb': run_record['peak_rss_mb'],
+        'phases': phases,
+        'stages': stages,
+    }
+
+
+def git_commit():
+    """Short hash of the checked-out commit, None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_run(history, entry):
+    """Last successful run in history of the same size, seed and options"""
+    for past in reversed(history):
+        if (past['success'] and past['rows'] == entry['rows'] and past['seed'] == entry['seed']
+                and past['options'] == entry['options']):
+            return past
+    return None
+
+
+def regressions(entry, previous, tolerance):
+    """[(phase, measure, before, after)] for the phases that got worse by more than tolerance"""
+    worse = []
+    for phase, now in entry['phases'].items():
+        before = previous['phases'].get(phase)
+        if before is None:
+            continue
+        for measure in ['wall_s', 'peak_rss_mb']:
+            if before[measure] and now[measure] > before[measure] * (1 + tolerance):
+                worse.append((phase, measure, before[measure], now[measure]))
+    return worse
+
+
+def change(now, before):
+    return f"{(now / before - 1) * 100:>+6.0f}%" if before else f"{'':>7}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=parse_size, nargs='+', default=[parse_size('10k'), parse_size('1m')],
+                        help="sales rows per run, numbers or 10k / 1m / 50m (default: 10k 1m)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help=f"where generated data sets are kept between runs (default: {DEFAULT_DATA_DIR})")
+    parser.add_argument('--history', default=DEFAULT_HISTORY,
+                        help=f"JSON lines file the runs are appended to (default: {DEFAULT_HISTORY})")
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help="passed on to the pipeline (stream sales in chunks, for the large sizes)")
+    parser.add_argument('--serial', action='store_true', help="passed on to the pipeline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="relative slowdown / memory growth flagged as a regression (default: 0.2)")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--clean', action='store_true', help="delete the generated data sets afterwards")
+    args = parser.parse_args()
+
+    options = {'chunk_size': args.chunk_size, 'serial': args.serial}
+    pipeline_args = (['--chunk-size', str(args.chunk_size)] if args.chunk_size else []) + \
+        (['--serial'] if args.serial else [])
+    history = read_history(args.history)
+
+    found = []
+    for rows in args.sizes:
+        print(f"\n{rows:,} sales")
+        data_path = dataset_dir(args.data_dir, rows, args.seed)
+        elapsed, run_record = run_pipeline(data_path, pipeline_args)
+        entry = summarize(rows, args.seed, options, elapsed, run_record)
+        previous = previous_run(history, entry)
+
+        print(f"  {'phase':<10} {'wall (s)':>9} {'peak MB':>9}" + (f" {'vs ' + previous['timestamp'][:10]:>26}" if previous else ""))
+        for phase, now in entry['phases'].items():
+            line = f"  {phase:<10} {now['wall_s']:>9.2f} {now['peak_rss_mb']:>9.1f}"
+            if previous and phase in previous['phases']:
+                before = previous['phases'][phase]
+                line += f"  time {change(now['wall_s'], before['wall_s'])}  memory {change(now['peak_rss_mb'], before['peak_rss_mb'])}"
+            print(line)
+        print(f"  {'total':<10} {elapsed:>9.2f} {entry['peak_rss_mb'] or 0:>9.1f}  (process wall time, run peak RSS)")
+
+        if previous:
+            for phase, measure, before, now in regressions(entry, previous, args.tolerance):
+                found.append((rows, phase))
+                print(f"  ✗ {phase} {'time' if measure == 'wall_s' else 'peak RSS'} regressed: {before:.2f} -> {now:.2f}")
+
+        history.append(entry)
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    print(f"\n✓ {len(args.sizes)} run(s) appended to '{args.history}'")
+    if args.clean:
+        shutil.rmtree(args.data_dir, ignore_errors=True)
+    if found and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Time the data profiler on generated raw files with 1, 2, 4... workers and check its distinct counts
+
+The three raw files are generated once (see generate_data.py, kept in
+--data-dir like benchmark_pipeline.py does) and profiled with each worker
+count of --workers. Every run must give the same profile. Distinct counts
+are then compared with pandas' exact nunique (which reads each file whole,
+so skip it with --no-exact on the largest sizes).
+
+Usage: python benchmark_profiling.py [--rows 1m] [--workers 1 2 4] [--no-exact]
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from benchmark_pipeline import dataset_dir, DEFAULT_DATA_DIR
+from generate_data import parse_size
+from profiling import profile_files, profile_to_dict, DEFAULT_FILES
+
+
+def comparable(profile_dict):
+    """The figures of a profile, without what depends on the run (time, shards)"""
+    return {path: {column: stats for column, stats in profile['columns'].items()}
+            for path, profile in profile_dict['files'].items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=parse_size, default=parse_size('1m'),
+                        help="sales rows, a number or 10k / 1m / 50m (default: 1m)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--no-exact', action='store_true', help="don't check the distinct counts against pandas")
+    args = parser.parse_args()
+
+    data_path = dataset_dir(args.data_dir, args.rows, args.seed)
+    paths = [os.path.join(data_path, name) for name in DEFAULT_FILES]
+    size_mb = sum(os.path.getsize(path) for path in paths) / 1024**2
+    print(f"{args.rows:,} sales, {size_mb:.1f} MB of raw files, {os.cpu_count()} core(s)")
+
+    print(f"\n{'workers':>7} {'time (s)':>9} {'MB/s':>8} {'speedup':>8}")
+    print("-" * 35)
+    first, baseline = None, None
+    for workers in args.workers:
+        start = time.perf_counter()
+        profile = profile_to_dict(profile_files(paths, workers, serial=workers == 1))
+        seconds = time.perf_counter() - start
+        baseline = baseline or seconds
+        print(f"{workers:>7} {seconds:>9.2f} {size_mb / seconds:>8.1f} {baseline / seconds:>7.2f}x")
+        if first is None:
+            first = profile
+        elif comparable(profile) != comparable(first):
+            raise AssertionError(f"the profile with {workers} workers differs from the one with {args.workers[0]}")
+    print("\n✓ Same profile with every worker count")
+
+    if args.no_exact:
+        return
+    print(f"\n{'column':<36} {'distinct':>10} {'exact':>10} {'error':>8}")
+    print("-" * 67)
+    for path in paths:
+        exact = pd.read_csv(path, dtype=str, quotechar='"', skipinitialspace=True).nunique()
+        for column, stats in first['files'][path]['columns'].items():
+            error = (stats['distinct'] - exact[column]) / exact[column] * 100 if exact[column] else 0.0
+            marker = '' if stats['distinct_exact'] else ' (HLL)'
+            print(f"{os.path.basename(path) + ' ' + column:<36} {stats['distinct']:>10} {exact[column]:>10} "
+                  f"{error:>+7.2f}%{marker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Run every query of business_queries.sql and analytics_queries.sql on generated data, with and without the secondary indexes
+
+The OLTP tables and the star schema are generated (see
+benchmark_warehouse.generated_frames), bulk loaded without secondary
+indexes, and each query is timed (best of --repeat) and EXPLAINed. Then the
+indexes of TABLE_INDEXES / WAREHOUSE_INDEXES are built and everything runs
+again. Timings and plans go to a JSON file, a summary to the console.
+
+SQLite (the default, one fresh file per schema) gets Python versions of
+the MySQL functions the queries use (CONCAT, YEAR, MONTH, MONTHNAME); pass
+--database-url / --warehouse-url to run against real MySQL databases.
+
+Usage: python benchmark_queries.py [--rows 100000] [--repeat 3] [--output query_benchmark.json]
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, event, text
+
+from benchmark_warehouse import generated_frames
+from bulk_load import bulk_load, create_indexes, TABLE_DDL, TABLE_INDEXES
+from warehouse import build_star_schema, load_warehouse, WAREHOUSE_DDL, WAREHOUSE_INDEXES
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+QUERY_FILES = {
+    'oltp': os.path.join(HERE, 'business_queries.sql'),
+    'warehouse': os.path.join(HERE, '..', 'part3-datawarehouse', 'analytics_queries.sql'),
+}
+
+# "-- Query 1: Customer Purchase History" / "-- QUERY 1: MONTHLY SALES ..."
+TITLE = re.compile(r'--\s*query\s+(\d+)\s*:\s*(.*)', re.IGNORECASE)
+MARKS = re.compile(r'\(\d+ marks\)')
+
+
+def read_queries(path):
+    """[(title, sql)] for every statement of a .sql file, skipping USE statements"""
+    queries, lines, title = [], [], None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            match = TITLE.match(line.strip())
+            if match:
+                title = f"Query {match.group(1)}: {MARKS.sub('', match.group(2)).strip()}"
+            code = line.split('--', 1)[0].rstrip()
+            if not code.strip():
+                continue
+            lines.append(code)
+            if code.endswith(';'):
+                sql = '\n'.join(lines).rstrip(';').strip()
+                lines = []
+                if not sql.upper().startswith('USE '):
+                    queries.append((title, sql))
+    return queries
+
+
+def _to_date(value):
+    return date.fromisoformat(str(value)[:10])
+
+
+def add_mysql_functions(engine):
+    """Register the MySQL functions used by the query files on every SQLite connection"""
+    @event.listens_for(engine, 'connect')
+    def register(dbapi_connection, connection_record):
+        # CONCAT is NULL when any argument is, as in MySQL
+        dbapi_connection.create_function(
+            'CONCAT', -1, lambda *values: None if None in values else ''.join(str(value) for value in values),
+            deterministic=True)
+        dbapi_connection.create_function('YEAR', 1, lambda value: value and _to_date(value).year, deterministic=True)
+        dbapi_connection.create_function('MONTH', 1, lambda value: value and _to_date(value).month, deterministic=True)
+        dbapi_connection.create_function('MONTHNAME', 1, lambda value: value and _to_date(value).strftime('%B'),
+                                         deterministic=True)
+
+
+def explain(conn, sql):
+    """Query plan as a list of text lines"""
+    if conn.dialect.name == 'sqlite':
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    result = conn.execute(text(f"EXPLAIN {sql}"))
+    columns = list(result.keys())
+    return [', '.join(f"{column}={value}" for column, value in zip(columns, row) if value is not None)
+            for row in result]
+
+
+def run_queries(engine, queries, repeat):
+    """[{title, sql, rows, best_ms, plan}] for each query"""
+    results = []
+    with engine.connect() as conn:
+        for title, sql in queries:
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                rows = conn.execute(text(sql)).fetchall()
+                times.append(time.perf_counter() - start)
+            results.append({
+                'title': title,
+                'sql': sql,
+                'rows': len(rows),
+                'best_ms': min(times) * 1000,
+                'plan': explain(conn, sql),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000, help="orders (and order items / facts) to generate")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    parser.add_argument('--database-url', default=None, help="OLTP database (dropped and reloaded)")
+    parser.add_argument('--warehouse-url', default=None, help="warehouse database (dropped and reloaded)")
+    parser.add_argument('--output', default='query_benchmark.json')
+    args = parser.parse_args()
+
+    frames = generated_frames(args.rows)
+    star, _ = build_star_schema(frames['customers'], frames['products'], frames['orders'], frames['order_items'])
+    queries = {schema: read_queries(path) for schema, path in QUERY_FILES.items()}
+
+    report = {'rows': args.rows, 'repeat': args.repeat, 'schemas': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        engines = {
+            'oltp': create_engine(args.database_url or f"sqlite:///{os.path.join(tmp, 'fleximart.db')}"),
+            'warehouse': create_engine(args.warehouse_url or f"sqlite:///{os.path.join(tmp, 'fleximart_dw.db')}"),
+        }
+        for engine in engines.values():
+            if engine.dialect.name == 'sqlite':
+                add_mysql_functions(engine)
+
+        # Load without secondary indexes first
+        bulk_load(engines['oltp'], frames, batch_size=args.batch_size, indexes={})
+        load_warehouse(engines['warehouse'], star, batch_size=args.batch_size, indexes={})
+
+        runs = {}
+        for phase in ['no secondary indexes', 'indexed']:
+            if phase == 'indexed':
+                create_indexes(engines['oltp'], [table for table in TABLE_DDL if table in frames], TABLE_INDEXES)
+                create_indexes(engines['warehouse'], [table for table in WAREHOUSE_DDL if table in star], WAREHOUSE_INDEXES)
+            for schema, engine in engines.items():
+                runs[schema, phase] = run_queries(engine, queries[schema], args.repeat)
+
+        for engine in engines.values():
+            engine.dispose()
+
+    print(f"{'query':<52} {'rows':>6} {'no index (ms)':>14} {'indexed (ms)':>13} {'speedup':>8}")
+    print("-" * 97)
+    for schema in engines:
+        report['schemas'][schema] = []
+        print(f"[{os.path.basename(QUERY_FILES[schema])}]")
+        for plain, indexed in zip(runs[schema, 'no secondary indexes'], runs[schema, 'indexed']):
+            report['schemas'][schema].append({
+                'title': plain['title'],
+                'sql': plain['sql'],
+                'rows': indexed['rows'],
+                'no_secondary_indexes': {'best_ms': plain['best_ms'], 'plan': plain['plan']},
+                'indexed': {'best_ms': indexed['best_ms'], 'plan': indexed['plan']},
+            })
+            title = (plain['title'] or '')[:52]
+            print(f"{title:<52} {indexed['rows']:>6} {plain['best_ms']:>14.1f} {indexed['best_ms']:>13.1f} "
+                  f"{plain['best_ms'] / indexed['best_ms']:>7.1f}x")
+            for line in indexed['plan']:
+                print(f"    {line}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Timings and EXPLAIN output saved to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Query latency of the warehouse analytics queries on fact_sales vs on the rollup tables, as facts grow
+
+For each size a star schema (with its rollups) is built from generated ETL
+output and loaded into a fresh SQLite file, then each analytics query runs
+in its fact_sales form (the old analytics_queries.sql) and its rollup form
+(the current one). Both forms must return the same rows. The queries are
+the SQLite spelling of analytics_queries.sql.
+
+Usage: python benchmark_rollups.py [--sizes 100000 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from benchmark_warehouse import generated_frames
+from warehouse import build_star_schema, load_warehouse
+
+SEGMENTS = """
+    SELECT
+        CASE WHEN total_spent > 50000 THEN 'High Value'
+             WHEN total_spent BETWEEN 20000 AND 50000 THEN 'Medium Value'
+             ELSE 'Low Value' END AS customer_segment,
+        COUNT(*) AS customer_count,
+        ROUND(SUM(total_spent), 2) AS total_revenue
+    FROM customer_spending
+    GROUP BY 1
+    ORDER BY 1"""
+
+# Query name: (on fact_sales, on the rollups)
+QUERIES = {
+    'monthly drill-down': (
+        """SELECT d.year, d.quarter, d.month_name,
+                  ROUND(SUM(f.total_amount), 2) AS total_sales, SUM(f.quantity_sold) AS total_quantity
+           FROM fact_sales f JOIN dim_date d ON f.date_key = d.date_key
+           WHERE d.year = 2024
+           GROUP BY d.year, d.quarter, d.month, d.month_name
+           ORDER BY d.year, d.month""",
+        """SELECT d.year, d.quarter, d.month_name,
+                  ROUND(SUM(r.total_amount), 2) AS total_sales, SUM(r.quantity_sold) AS total_quantity
+           FROM agg_sales_month_product r JOIN dim_date d ON d.date_key = r.month_key * 100 + 1
+           WHERE r.month_key BETWEEN 202401 AND 202412
+           GROUP BY d.year, d.quarter, d.month, d.month_name
+           ORDER BY d.year, d.month""",
+    ),
+    'product revenue share': (
+        """SELECT p.product_name, p.category, SUM(f.quantity_sold) AS units_sold,
+                  ROUND(SUM(f.total_amount), 2) AS revenue,
+                  ROUND(SUM(f.total_amount) * 100.0 / SUM(SUM(f.total_amount)) OVER (), 2) AS revenue_percentage
+           FROM fact_sales f JOIN dim_product p ON f.product_key = p.product_key
+           GROUP BY p.product_key, p.product_name, p.category
+           ORDER BY revenue DESC, p.product_key
+           LIMIT 10""",
+        """SELECT p.product_name, p.category, SUM(r.quantity_sold) AS units_sold,
+                  ROUND(SUM(r.total_amount), 2) AS revenue,
+                  ROUND(SUM(r.total_amount) * 100.0 / SUM(SUM(r.total_amount)) OVER (), 2) AS revenue_percentage
+           FROM agg_sales_month_product r JOIN dim_product p ON r.product_key = p.product_key
+           GROUP BY p.product_key, p.product_name, p.category
+           ORDER BY revenue DESC, p.product_key
+           LIMIT 10""",
+    ),
+    'customer segments': (
+        """WITH customer_spending AS (
+               SELECT c.customer_key, SUM(f.total_amount) AS total_spent
+               FROM fact_sales f JOIN dim_customer c ON f.customer_key = c.customer_key
+               GROUP BY c.customer_key
+           )""" + SEGMENTS,
+        """WITH customer_spending AS (
+               SELECT c.customer_key, SUM(r.total_amount) AS total_spent
+               FROM agg_sales_month_customer r JOIN dim_customer c ON r.customer_key = c.customer_key
+               GROUP BY c.customer_key
+           )""" + SEGMENTS,
+    ),
+}
+
+
+def best_time(engine, sql, repeat):
+    """Fastest of repeat runs, and the rows of the last one"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = pd.read_sql(sql, engine)
+        times.append(time.perf_counter() - start)
+    return min(times), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"{'facts':>12} {'query':>22} {'fact_sales (ms)':>16} {'rollup (ms)':>12} {'speedup':>8}")
+    print("-" * 74)
+
+    for rows in args.sizes:
+        frames = generated_frames(rows)
+        star, metrics = build_star_schema(frames['customers'], frames['products'],
+                                          frames['orders'], frames['order_items'])
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'fleximart_dw.db')}")
+            load_warehouse(engine, star, batch_size=args.batch_size)
+
+            for name, (fact_sql, rollup_sql) in QUERIES.items():
+                fact_time, expected = best_time(engine, fact_sql, args.repeat)
+                rollup_time, actual = best_time(engine, rollup_sql, args.repeat)
+                pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+                print(f"{rows:>12,} {name:>22} {fact_time * 1000:>16.1f} {rollup_time * 1000:>12.1f} "
+                      f"{fact_time / rollup_time:>7.1f}x")
+            engine.dispose()
+
+        print(f"{'':>12} rollup rows: {metrics['agg_sales_month_product']:,} month x product, "
+              f"{metrics['agg_sales_month_customer']:,} month x customer")
+
+
+if __name__ == "__main__":
+    main()
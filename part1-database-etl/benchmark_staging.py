@@ -0,0 +1,66 @@
+"""Compare a cold CSV parse with the staging cache: first run, warm hit and invalidation
+
+For each size a synthetic sales_raw.csv is written, then timed:
+  csv parse      plain read_csv with explicit dtypes (what every run paid before)
+  cache miss     parse + write the columnar copy (first run)
+  warm hit       memory-mapped read of the columnar copy
+  touched        mtime changed, same content (hash check, then hit)
+  invalidated    a row appended (re-parse + rewrite)
+
+Usage: python benchmark_staging.py [--sizes 100000 1000000] [--formats parquet feather]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmark_streaming import write_sales_file
+from staging import StagingCache, read_source_csv, STAGING_FORMATS, HIT
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--formats', nargs='+', choices=STAGING_FORMATS, default=STAGING_FORMATS)
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'format':>8} {'csv parse':>10} {'miss':>8} {'warm hit':>9} {'touched':>8} {'invalid.':>9} {'speedup':>8}")
+    print("-" * 79)
+
+    for rows in args.sizes:
+        for file_format in args.formats:
+            with tempfile.TemporaryDirectory() as tmp:
+                # Named like the real file so its explicit dtypes apply
+                path = os.path.join(tmp, 'sales_raw.csv')
+                write_sales_file(path, rows)
+                cache = StagingCache(os.path.join(tmp, 'cache'), file_format)
+
+                expected, parse_time = timed(read_source_csv, path)
+                _, miss_time = timed(cache.read_csv, path)
+                cached, hit_time = timed(cache.read_csv, path)
+                assert cache.status[path] == HIT
+                pd.testing.assert_frame_equal(cached, expected)
+
+                os.utime(path)
+                _, touched_time = timed(cache.read_csv, path)
+                assert cache.status[path] == HIT
+
+                with open(path, 'a') as f:
+                    f.write('T0,C1,P1,1,100.0,2024-01-01,Completed\n')
+                _, invalidated_time = timed(cache.read_csv, path)
+                assert cache.status[path] != HIT
+
+                print(f"{rows:>12,} {file_format:>8} {parse_time:>10.2f} {miss_time:>8.2f} {hit_time:>9.2f} "
+                      f"{touched_time:>8.2f} {invalidated_time:>9.2f} {parse_time / hit_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Startup cost of each etl_pipeline.py command: import time (-X importtime), heavy modules loaded and wall time
+
+Every command runs in a fresh interpreter with -X importtime on generated
+raw files (see generate_data.py, kept in --data-dir like
+benchmark_pipeline.py does), against a SQLite file that a first full run
+fills. For each command the best of --repeat runs is shown with:
+
+  import ms    time spent importing modules, summed over the top-level
+               imports -X importtime reports (whenever they happen in the run)
+  pandas / sqlalchemy   whether the command imported them at all
+  heaviest     the top-level imports that cost the most
+
+Stages run with --serial, so every import happens in the measured process.
+
+Usage: python benchmark_startup.py [--rows 10k] [--repeat 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_pipeline import dataset_dir, HERE, DEFAULT_DATA_DIR
+from generate_data import parse_size
+
+# Command line of each measured command, after etl_pipeline.py and before the shared options
+COMMANDS = {
+    '--help': ['--help'],
+    'report': ['report'],
+    'validate': ['validate'],
+    'load customers': ['load', 'customers'],
+    'run': ['run'],
+}
+
+HEAVY_MODULES = ['pandas', 'sqlalchemy']
+
+
+def import_times(stderr):
+    """({top-level module: cumulative microseconds}, every module imported) from -X importtime output"""
+    times, modules = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+        # Nested imports are indented, and already counted in their parent's cumulative time
+        if not name.startswith('  '):
+            times[name.strip()] = times.get(name.strip(), 0) + int(cumulative)
+    return times, modules
+
+
+def run_command(command, data_path, work_dir):
+    """Run one etl_pipeline.py command, returns (wall seconds, ({top-level module: import µs}, modules imported))"""
+    run_record = os.path.join(work_dir, 'run_record.json')
+    if command[0] == '--help':
+        options = []
+    elif command[0] == 'report':
+        options = ['--run-record', run_record, '--output', os.path.join(work_dir, 'data_quality_report.txt')]
+    else:
+        options = ['--input-dir', data_path, '--serial', '--run-record', run_record,
+                   '--reject-file', os.path.join(work_dir, 'rejected_rows.parquet')]
+        if command[0] != 'validate':
+            options += ['--database-url', f"sqlite:///{os.path.join(work_dir, 'fleximart.db')}"]
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', os.path.join(HERE, 'etl_pipeline.py')] + command + options,
+                            cwd=work_dir, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return time.perf_counter() - start, import_times(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=parse_size, default=parse_size('10k'),
+                        help="sales rows, a number or 10k / 1m / 50m (default: 10k)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data_path = os.path.abspath(dataset_dir(args.data_dir, args.rows, args.seed))
+    with tempfile.TemporaryDirectory() as work_dir:
+        # The report and load commands need the run record and tables of an earlier full run
+        run_command(COMMANDS['run'], data_path, work_dir)
+
+        print(f"{args.rows:,} sales, best of {args.repeat}\n")
+        print(f"{'command':<16} {'wall (s)':>9} {'import ms':>10} {'pandas':>7} {'sqlalchemy':>11}   heaviest imports")
+        print("-" * 96)
+        for name, command in COMMANDS.items():
+            runs = [run_command(command, data_path, work_dir) for _ in range(args.repeat)]
+            wall_s, (times, modules) = min(runs, key=lambda run: run[0])
+            import_ms = min(sum(run_times.values()) for _, (run_times, _) in runs) / 1000
+            loaded = ['yes' if module in modules else 'no' for module in HEAVY_MODULES]
+            heaviest = ', '.join(f"{module} {us / 1000:.0f}" for module, us in
+                                 sorted(times.items(), key=lambda item: -item[1])[:3])
+            print(f"{name:<16} {wall_s:>9.3f} {import_ms:>10.1f} {loaded[0]:>7} {loaded[1]:>11}   {heaviest}")
+
+
+if __name__ == "__main__":
+    main()
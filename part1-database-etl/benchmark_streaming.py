@@ -0,0 +1,107 @@
+"""Measure peak memory of the in-memory and chunked sales transforms as the file grows
+
+Each run happens in a fresh subprocess so its peak RSS is not polluted by
+earlier runs. The in-memory and chunked modes run
+etl_pipeline.prepare_sales, the code the pipeline runs (with and without
+--chunk-size): the chunked mode keeps the cleaned parts of every chunk and
+concatenates them, since validate and load need whole tables. So only the
+raw rows are bounded by the chunk size, the cleaned tables still grow with
+the file. The 'discard' row runs stream_sales alone and throws each chunk's
+output away: the floor the chunked transform itself needs, not something
+the pipeline runs.
+
+Usage: python benchmark_streaming.py [--sizes 100000 1000000 5000000] [--chunk-size 100000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from streaming import peak_rss_mb, read_csv_chunks
+
+MODES = ['in-memory', 'chunked', 'discard']
+
+
+def write_sales_file(path, rows, seed=42):
+    """Write a sales_raw.csv-like file with duplicates, missing IDs and mixed date formats"""
+    rng = np.random.default_rng(seed)
+
+    transaction_ids = np.arange(1, rows + 1)
+    # About 2% of rows repeat an earlier transaction
+    repeats = rng.random(rows) < 0.02
+    transaction_ids[repeats] = rng.integers(1, rows + 1, repeats.sum())
+
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 366, rows), unit='D')
+    date_formats = ['%Y-%m-%d', '%d/%m/%Y', '%m-%d-%Y']
+    formats = rng.integers(0, len(date_formats), rows)
+    date_strings = np.empty(rows, dtype=object)
+    for number, fmt in enumerate(date_formats):
+        mask = formats == number
+        date_strings[mask] = dates[mask].strftime(fmt)
+
+    df = pd.DataFrame({
+        'transaction_id': np.char.add('T', transaction_ids.astype(str)),
+        'customer_id': np.char.add('C', rng.integers(1, 100_000, rows).astype(str)).astype(object),
+        'product_id': np.char.add('P', rng.integers(1, 5_000, rows).astype(str)).astype(object),
+        'quantity': rng.integers(1, 10, rows),
+        'unit_price': rng.integers(100, 100_000, rows).astype(float),
+        'transaction_date': date_strings,
+        'status': np.array(['Completed', 'Pending', 'Cancelled'])[rng.integers(0, 3, rows)],
+    })
+    df.loc[rng.random(rows) < 0.01, 'customer_id'] = None
+    df.loc[rng.random(rows) < 0.01, 'product_id'] = None
+    df.to_csv(path, index=False)
+
+
+def run_one(mode, path, chunk_size):
+    """Run a single transform in this process and print 'seconds peak_mb'"""
+    import etl_pipeline
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'discard':
+            metrics = {}
+            for _ in etl_pipeline.stream_sales(read_csv_chunks(path, chunk_size), metrics):
+                pass
+        else:
+            etl_pipeline.prepare_sales(chunk_size if mode == 'chunked' else None, path=path)
+    print(f"{time.perf_counter() - start} {peak_rss_mb()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--run', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(args.run[0], args.run[1], args.chunk_size)
+        return
+
+    print(f"{'rows':>12} {'mode':>10} {'time (s)':>10} {'peak RSS (MB)':>14}")
+    print("-" * 49)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            path = os.path.join(tmp, f'sales_{rows}.csv')
+            write_sales_file(path, rows)
+
+            for mode in MODES:
+                output = subprocess.run(
+                    [sys.executable, __file__, '--run', mode, path, '--chunk-size', str(args.chunk_size)],
+                    check=True, capture_output=True, text=True,
+                ).stdout.split()
+                seconds, peak = float(output[-2]), float(output[-1])
+                print(f"{rows:>12,} {mode:>10} {seconds:>10.2f} {peak:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Build and load the star schema from generated ETL output, and check it against the OLTP tables in SQLite
+
+For each size, clean customers/products/orders/order_items frames are
+generated (see benchmark_bulk_load.make_frames, with a year of order dates),
+loaded into a fresh SQLite file as the OLTP tables, and the star schema
+built from them is loaded into a second SQLite file. The run fails unless
+fact_sales agrees with order_items: same row count, and the same revenue
+and units per customer, per product and per day.
+
+Usage: python benchmark_warehouse.py [--sizes 100000 1000000] [--batch-size 50000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from benchmark_bulk_load import make_frames
+from bulk_load import bulk_load
+from warehouse import build_star_schema, load_warehouse
+
+# Totals per natural key, from the OLTP tables and from the star schema
+OLTP_TOTALS = {
+    'customer': """
+        SELECT 'C' || substr('00' || o.customer_id, -3, 3) AS natural_id, o.customer_id AS id,
+               SUM(oi.subtotal) AS revenue, SUM(oi.quantity) AS units
+        FROM order_items oi JOIN orders o ON o.order_id = oi.order_id
+        GROUP BY o.customer_id""",
+    'product': """
+        SELECT oi.product_id AS id, SUM(oi.subtotal) AS revenue, SUM(oi.quantity) AS units
+        FROM order_items oi GROUP BY oi.product_id""",
+    'date': """
+        SELECT CAST(replace(o.order_date, '-', '') AS INTEGER) AS id,
+               SUM(oi.subtotal) AS revenue, SUM(oi.quantity) AS units
+        FROM order_items oi JOIN orders o ON o.order_id = oi.order_id
+        GROUP BY o.order_date""",
+}
+WAREHOUSE_TOTALS = {
+    'customer': """
+        SELECT CAST(substr(c.customer_id, 2) AS INTEGER) AS id,
+               SUM(f.total_amount) AS revenue, SUM(f.quantity_sold) AS units
+        FROM fact_sales f JOIN dim_customer c ON c.customer_key = f.customer_key
+        GROUP BY c.customer_id""",
+    'product': """
+        SELECT CAST(substr(p.product_id, 2) AS INTEGER) AS id,
+               SUM(f.total_amount) AS revenue, SUM(f.quantity_sold) AS units
+        FROM fact_sales f JOIN dim_product p ON p.product_key = f.product_key
+        GROUP BY p.product_id""",
+    'date': """
+        SELECT d.date_key AS id, SUM(f.total_amount) AS revenue, SUM(f.quantity_sold) AS units
+        FROM fact_sales f JOIN dim_date d ON d.date_key = f.date_key
+        GROUP BY d.date_key""",
+}
+
+
+def generated_frames(rows, seed=42):
+    """make_frames output with order dates spread over 2024"""
+    frames = make_frames(rows, seed)
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 366, rows), unit='D')
+    frames['orders']['order_date'] = pd.Categorical(days.strftime('%Y-%m-%d'))
+    return frames
+
+
+def check_totals(oltp_engine, warehouse_engine):
+    """Compare revenue and units per customer, product and day between the two databases"""
+    for level in OLTP_TOTALS:
+        expected = pd.read_sql(OLTP_TOTALS[level], oltp_engine)[['id', 'revenue', 'units']]
+        actual = pd.read_sql(WAREHOUSE_TOTALS[level], warehouse_engine)
+        expected = expected.sort_values('id').reset_index(drop=True)
+        actual = actual.sort_values('id').reset_index(drop=True)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"{'facts':>12} {'build (s)':>10} {'load (s)':>9} {'facts/s':>12} {'check':>6}")
+    print("-" * 53)
+
+    for rows in args.sizes:
+        frames = generated_frames(rows)
+        with tempfile.TemporaryDirectory() as tmp:
+            oltp_engine = create_engine(f"sqlite:///{os.path.join(tmp, 'fleximart.db')}")
+            warehouse_engine = create_engine(f"sqlite:///{os.path.join(tmp, 'fleximart_dw.db')}")
+            bulk_load(oltp_engine, frames, strategy='executemany', batch_size=args.batch_size)
+
+            start = time.perf_counter()
+            star, metrics = build_star_schema(frames['customers'], frames['products'],
+                                              frames['orders'], frames['order_items'])
+            build_time = time.perf_counter() - start
+            assert metrics['fact_sales'] == rows and metrics['facts_skipped'] == 0, metrics
+
+            start = time.perf_counter()
+            load_warehouse(warehouse_engine, star, strategy='executemany', batch_size=args.batch_size)
+            load_time = time.perf_counter() - start
+
+            check_totals(oltp_engine, warehouse_engine)
+            oltp_engine.dispose()
+            warehouse_engine.dispose()
+
+        print(f"{rows:>12,} {build_time:>10.2f} {load_time:>9.2f} {rows / (build_time + load_time):>12,.0f} {'ok':>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import csv
+import os
+import tempfile
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from defaults import DEFAULT_BATCH_SIZE
+from instrument import measure
+from scheduler import Stage, run_stages
+
+# Bulk-load backends for the LOAD phase.
+#
+# Tables are created from explicit DDL (types from schema_documentation.md),
+# rows are pushed in batches with one of the strategies in LOAD_STRATEGIES,
+# and secondary indexes are only built once all rows are in.
+#
+# The DDL is plain SQL that both MySQL and SQLite accept, so SQLite can be
+# used as a local stand-in for the MySQL database.
+
+# Load order matters: parents before children
+TABLE_DDL = {
+    'customers': """
+        CREATE TABLE customers (
+            customer_id BIGINT PRIMARY KEY,
+            first_name VARCHAR(50),
+            last_name VARCHAR(50),
+            email VARCHAR(100) NOT NULL,
+            phone VARCHAR(20),
+            city VARCHAR(50),
+            registration_date DATE
+        )""",
+    'products': """
+        CREATE TABLE products (
+            product_id BIGINT PRIMARY KEY,
+            product_name VARCHAR(100),
+            category VARCHAR(50),
+            price DECIMAL(10,2) NOT NULL,
+            stock_quantity INT DEFAULT 0
+        )""",
+    'orders': """
+        CREATE TABLE orders (
+            order_id BIGINT PRIMARY KEY,
+            customer_id BIGINT NOT NULL,
+            order_date DATE NOT NULL,
+            total_amount DECIMAL(10,2) NOT NULL,
+            status VARCHAR(20) DEFAULT 'Pending',
+            FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+        )""",
+    'order_items': """
+        CREATE TABLE order_items (
+            order_item_id BIGINT PRIMARY KEY,
+            order_id BIGINT NOT NULL,
+            product_id BIGINT NOT NULL,
+            quantity INT,
+            unit_price DECIMAL(10,2),
+            subtotal DECIMAL(10,2),
+            FOREIGN KEY (order_id) REFERENCES orders(order_id),
+            FOREIGN KEY (product_id) REFERENCES products(product_id)
+        )""",
+}
+
+# Natural keys, used to upsert incremental loads
+TABLE_KEYS = {
+    'customers': 'customer_id',
+    'products': 'product_id',
+    'orders': 'order_id',
+    'order_items': 'order_item_id',
+}
+
+# Foreign key parents, which must be loaded before the table itself
+TABLE_PARENTS = {
+    'orders': ['customers'],
+    'order_items': ['orders', 'products'],
+}
+
+# Created after the load so inserts don't maintain them row by row. Composite
+# indexes carry the columns business_queries.sql reads, so those queries are
+# answered from the index alone (order_id is listed explicitly because SQLite
+# only adds the rowid, not an INT PRIMARY KEY, to its index entries).
+TABLE_INDEXES = {
+    'orders': [
+        # Query 1: orders per customer, COUNT(DISTINCT order_id) and SUM(total_amount)
+        ('idx_orders_customer_amount', ['customer_id', 'order_id', 'total_amount']),
+        # Query 3: range on order_date, SUM(total_amount)
+        ('idx_orders_date_amount', ['order_date', 'order_id', 'total_amount']),
+    ],
+    'order_items': [
+        ('idx_order_items_order_id', ['order_id']),
+        # Query 2: items per product, SUM(quantity) and SUM(subtotal)
+        ('idx_order_items_product_sales', ['product_id', 'quantity', 'subtotal']),
+    ],
+}
+
+# SQLite refuses statements with more bound variables than this
+SQLITE_MAX_VARIABLES = 32766
+
+
+def _placeholder(engine):
+    """Positional parameter marker for the engine's DB-API driver"""
+    return '?' if engine.dialect.paramstyle == 'qmark' else '%s'
+
+
+def _batches(df, batch_size):
+    """Yield lists of plain Python tuples (NaN as None), batch_size rows at a time"""
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size].astype(object)
+        batch = batch.where(batch.notna(), None)
+        yield list(batch.itertuples(index=False, name=None))
+
+
+def load_executemany(engine, cursor, table, df, batch_size):
+    """One parameterized INSERT per batch, sent with cursor.executemany"""
+    marker = _placeholder(engine)
+    columns = ', '.join(df.columns)
+    sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join([marker] * len(df.columns))})"
+
+    for rows in _batches(df, batch_size):
+        cursor.executemany(sql, rows)
+
+
+def load_multirow(engine, cursor, table, df, batch_size):
+    """One INSERT ... VALUES (...), (...), ... statement per batch"""
+    marker = _placeholder(engine)
+    columns = ', '.join(df.columns)
+    row_values = f"({', '.join([marker] * len(df.columns))})"
+
+    if engine.dialect.name == 'sqlite':
+        batch_size = max(1, min(batch_size, SQLITE_MAX_VARIABLES // len(df.columns)))
+
+    for rows in _batches(df, batch_size):
+        sql = f"INSERT INTO {table} ({columns}) VALUES {', '.join([row_values] * len(rows))}"
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+def _escape_backslashes(df):
+    """Double every backslash in the text columns
+
+    LOAD DATA keeps its default FIELDS ESCAPED BY '\\', which is what makes
+    \\N read as NULL, so a backslash in a value must be escaped to survive.
+    """
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object or isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object).map(
+                lambda value: value.replace('\\', '\\\\') if isinstance(value, str) else value)
+    return df
+
+
+def load_data_infile(engine, cursor, table, df, batch_size):
+    """Stream the table through a temp CSV file with LOAD DATA LOCAL INFILE
+
+    MySQL only reads the file server-side. SQLite has no LOAD DATA, so there
+    the same temp file is read back and inserted with executemany, undoing
+    the escapes the way MySQL does.
+    """
+    handle, path = tempfile.mkstemp(suffix='.csv', prefix=f'{table}_')
+    os.close(handle)
+
+    try:
+        # \N is how MySQL spells NULL in a data file; a value '\N' is written as '\\N'
+        df = _escape_backslashes(df)
+        df.to_csv(path, index=False, header=False, na_rep='\\N', chunksize=batch_size)
+
+        if engine.dialect.name == 'mysql':
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE '{path.replace(os.sep, '/')}' INTO TABLE {table} "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+                f"LINES TERMINATED BY '\\n' ({', '.join(df.columns)})"
+            )
+            return
+
+        marker = _placeholder(engine)
+        sql = f"INSERT INTO {table} ({', '.join(df.columns)}) VALUES ({', '.join([marker] * len(df.columns))})"
+        with open(path, newline='') as data_file:
+            rows = []
+            for row in csv.reader(data_file):
+                rows.append([None if value == '\\N' else value.replace('\\\\', '\\') for value in row])
+                if len(rows) == batch_size:
+                    cursor.executemany(sql, rows)
+                    rows = []
+            if rows:
+                cursor.executemany(sql, rows)
+    finally:
+        os.remove(path)
+
+
+# Same names, in the same order, as defaults.LOAD_STRATEGY_NAMES (what the command line offers)
+LOAD_STRATEGIES = {
+    'executemany': load_executemany,
+    'multirow': load_multirow,
+    'load_data': load_data_infile,
+}
+
+
+def engine_options(strategy, connection_string):
+    """Extra create_engine arguments a strategy needs"""
+    if strategy == 'load_data' and make_url(connection_string).get_backend_name() == 'mysql':
+        # pymysql refuses LOAD DATA LOCAL unless the client enables it
+        return {'connect_args': {'local_infile': True}}
+    return {}
+
+
+def recreate_tables(engine, tables, ddl=TABLE_DDL, name='create_tables'):
+    """Drop and recreate the given tables (children dropped first) without secondary indexes"""
+    with measure(name), engine.begin() as conn:
+        if engine.dialect.name == 'mysql':
+            conn.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+
+        try:
+            for table in reversed(tables):
+                conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            for table in tables:
+                conn.execute(text(ddl[table]))
+        finally:
+            # The connection goes back to the pool, also when the DDL failed
+            if engine.dialect.name == 'mysql':
+                conn.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+
+
+def create_indexes(engine, tables, indexes=TABLE_INDEXES, name='create_indexes'):
+    """Build the secondary indexes of the given tables"""
+    with measure(name), engine.begin() as conn:
+        for table in tables:
+            for index_name, columns in indexes.get(table, []):
+                conn.execute(text(f"CREATE INDEX {index_name} ON {table} ({', '.join(columns)})"))
+
+
+def _restore_checks(raw_connection, cursor):
+    """Turn the session's constraint checks back on before the connection returns to the pool
+
+    If that fails too (say the load lost the connection), the connection is
+    invalidated instead, so the pool never hands it out with checks off.
+    """
+    try:
+        cursor.execute("SET UNIQUE_CHECKS = 1")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    except Exception:
+        raw_connection.invalidate()
+
+
+def load_table(engine, table, df, strategy='executemany', batch_size=DEFAULT_BATCH_SIZE):
+    """Load one (already created) table on its own pooled connection, in one transaction
+
+    Safe to call from several threads at once. Returns the number of rows loaded.
+    """
+    with measure(f'load_{table}', rows_in=len(df)) as record:
+        raw_connection = engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            if engine.dialect.name == 'mysql':
+                # Rows are already validated, skip per-row constraint checks during the load
+                cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+                cursor.execute("SET UNIQUE_CHECKS = 0")
+
+            try:
+                LOAD_STRATEGIES[strategy](engine, cursor, table, df, batch_size)
+                raw_connection.commit()
+            finally:
+                if engine.dialect.name == 'mysql':
+                    _restore_checks(raw_connection, cursor)
+            cursor.close()
+        finally:
+            raw_connection.close()
+        record['rows_out'] = len(df)
+
+    return len(df)
+
+
+def bulk_load(engine, frames, strategy='executemany', batch_size=DEFAULT_BATCH_SIZE, serial=False, records=None,
+              ddl=TABLE_DDL, parents=TABLE_PARENTS, indexes=TABLE_INDEXES, stage_prefix=''):
+    """Recreate and load tables from {table name: DataFrame} in one transaction per table
+
+    Tables run as stages of a small DAG: a table starts loading as soon as its
+    foreign key parents are in, so customers and products load concurrently
+    (one pooled connection each). serial=True loads one table at a time; so
+    does SQLite, which only allows one writer. The instrument records of the
+    stages are added to records when given.
+    ddl, parents and indexes describe another set of tables (see
+    warehouse.WAREHOUSE_DDL); stage_prefix tells their DDL stages apart.
+
+    Returns the number of rows loaded per table.
+    """
+    if strategy not in LOAD_STRATEGIES:
+        raise ValueError(f"Unknown load strategy '{strategy}', expected one of {list(LOAD_STRATEGIES)}")
+    tables = [table for table in ddl if table in frames]
+    create_stage = f'{stage_prefix}create_tables'
+    index_stage = f'{stage_prefix}create_indexes'
+
+    stages = [Stage(create_stage, recreate_tables, args=(engine, tables, ddl, create_stage))]
+    for table in tables:
+        table_parents = [f'load_{parent}' for parent in parents.get(table, []) if parent in frames]
+        stages.append(Stage(f'load_{table}', load_table, args=(engine, table, frames[table], strategy, batch_size),
+                            after=[create_stage] + table_parents))
+    stages.append(Stage(index_stage, create_indexes, args=(engine, tables, indexes, index_stage),
+                        after=[f'load_{table}' for table in tables]))
+
+    results, stage_records = run_stages(stages, serial=serial or engine.dialect.name == 'sqlite')
+    if records is not None:
+        records.extend(stage_records)
+
+    return {table: results[f'load_{table}'] for table in tables}
+
+
+def upsert_rows(engine, cursor, table, df, batch_size, key=None):
+    """Insert rows, updating the existing row when the key (default: the natural key) is already there"""
+    marker = _placeholder(engine)
+    key = key or TABLE_KEYS[table]
+    columns = ', '.join(df.columns)
+    sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join([marker] * len(df.columns))})"
+
+    updates = [column for column in df.columns if column != key]
+    if engine.dialect.name == 'mysql':
+        sql += " ON DUPLICATE KEY UPDATE " + ', '.join(f"{column} = VALUES({column})" for column in updates)
+    else:
+        # SQLite (3.24+) and PostgreSQL
+        sql += f" ON CONFLICT ({key}) DO UPDATE SET " + ', '.join(f"{column} = excluded.{column}" for column in updates)
+
+    for rows in _batches(df, batch_size):
+        cursor.executemany(sql, rows)
+
+
+def upsert_tables(engine, frames, batch_size=DEFAULT_BATCH_SIZE):
+    """Upsert {table name: DataFrame} into existing tables, parents first
+
+    Returns the number of rows sent per table.
+    """
+    upserted = {}
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        for table in TABLE_DDL:
+            if table not in frames:
+                continue
+            if len(frames[table]):
+                upsert_rows(engine, cursor, table, frames[table], batch_size)
+                raw_connection.commit()
+            upserted[table] = len(frames[table])
+        cursor.close()
+    finally:
+        raw_connection.close()
+
+    return upserted
@@ -73,7 +73,8 @@ SELECT
 FROM 
     orders o
 WHERE 
-    YEAR(o.order_date) = 2024
+    -- A range on the column itself (not YEAR(order_date)) can use idx_orders_date_amount
+    o.order_date >= '2024-01-01' AND o.order_date < '2025-01-01'
 GROUP BY 
     MONTH(o.order_date), MONTHNAME(o.order_date)
 ORDER BY 
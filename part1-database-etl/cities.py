@@ -0,0 +1,20 @@
+# Cities of the customer data and their states, shared by generate_data.py
+# (the cities it draws from, in this order) and warehouse.py
+# (dim_customer.state), so every generated city has a state.
+
+CITY_STATES = {
+    'Bangalore': 'Karnataka',
+    'Mumbai': 'Maharashtra',
+    'Delhi': 'Delhi',
+    'Hyderabad': 'Telangana',
+    'Chennai': 'Tamil Nadu',
+    'Pune': 'Maharashtra',
+    'Kolkata': 'West Bengal',
+    'Ahmedabad': 'Gujarat',
+    'Jaipur': 'Rajasthan',
+    'Lucknow': 'Uttar Pradesh',
+    'Kochi': 'Kerala',
+    'Indore': 'Madhya Pradesh',
+    'Chandigarh': 'Chandigarh',
+    'Trivandrum': 'Kerala',
+}
@@ -0,0 +1,26 @@
+# Defaults shared by the pipeline modules and the etl_pipeline command line.
+#
+# This module must stay free of pandas, numpy and SQLAlchemy imports: the
+# command line builds its parser (choices, defaults, --help) from these
+# values before it knows whether the command will touch any data or database.
+# The modules that own each setting re-export it under the same name.
+
+# aggregation.py
+DEFAULT_GROUP_ROWS = 100_000
+
+# bulk_load.py
+DEFAULT_BATCH_SIZE = 10_000
+LOAD_STRATEGY_NAMES = ['executemany', 'multirow', 'load_data']
+
+# incremental.py
+DEFAULT_STATE_DIR = '.etl_state'
+
+# staging.py
+DEFAULT_CACHE_DIR = '.etl_cache'
+STAGING_FORMATS = ['parquet', 'feather']
+
+# instrument.py
+DEFAULT_RUN_RECORD = 'run_record.json'
+
+# integrity.py
+DEFAULT_REJECT_FILE = 'rejected_rows.parquet'
@@ -0,0 +1,261 @@
+"""Generate customers_raw.csv, products_raw.csv and sales_raw.csv of any size, with the dirt the pipeline cleans
+
+The files have the layout of the sample files and the same kinds of
+problems, at the rates of DIRT: exact duplicate rows (transaction IDs seen
+twice), registration and transaction dates in mixed formats, missing
+emails, prices, stock levels, IDs, dates and statuses, IDs without their
+C/P prefix, sales referencing customers or products that don't exist,
+phones in several formats and city / category names in random casing with
+stray whitespace.
+
+Everything is vectorized with numpy and written CHUNK_ROWS rows at a time,
+each chunk from its own seeded generator, so a file of 50M sales never has
+to fit in memory and the same seed always gives the same bytes.
+
+Usage: python generate_data.py --rows 1m [--output-dir data/1m] [--seed 42]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from cities import CITY_STATES
+
+# Sizes of the benchmark data sets (sales rows); --rows also takes plain numbers
+SIZES = {'10k': 10_000, '1m': 1_000_000, '50m': 50_000_000}
+
+# Rows generated and written per chunk
+CHUNK_ROWS = 1_000_000
+
+# Share of rows that get each kind of dirt
+DIRT = {
+    'duplicate_rows': 0.02,       # exact copy of another row of the file (same ID)
+    'missing_email': 0.03,
+    'missing_price': 0.03,
+    'missing_stock': 0.03,
+    'missing_id': 0.01,           # customer / product ID of a sale
+    'unknown_reference': 0.005,   # sale of a customer / product that isn't in the files
+    'unprefixed_id': 0.01,        # '018' instead of 'C018'
+    'missing_date': 0.005,
+    'missing_status': 0.005,
+    'messy_case': 0.3,            # city / category not in Title Case, or padded
+}
+
+# Formats of the sample files, all understood by normalization.DateNormalizer
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%m-%d-%Y']
+REGISTRATION_DAYS = pd.date_range('2022-01-01', '2023-12-31')
+SALE_DAYS = pd.date_range('2024-01-01', '2024-12-31')
+
+FIRST_NAMES = np.array(['Rahul', 'Priya', 'Amit', 'Sneha', 'Vikram', 'Anjali', 'Ravi', 'Pooja', 'Karthik',
+                        'Deepa', 'Arjun', 'Lakshmi', 'Suresh', 'Neha', 'Manish', 'Divya', 'Rajesh', 'Kavya',
+                        'Arun', 'Swati', 'Nikhil', 'Priyanka', 'Rohit', 'Meera', 'Sanjay'], dtype=object)
+LAST_NAMES = np.array(['Sharma', 'Patel', 'Kumar', 'Reddy', 'Singh', 'Mehta', 'Verma', 'Iyer', 'Nair', 'Gupta',
+                       'Rao', 'Krishnan', 'Shah', 'Joshi', 'Menon', 'Pillai', 'Desai', 'Bose', 'Jain',
+                       'Kapoor', 'Nambiar', 'Agarwal'], dtype=object)
+EMAIL_DOMAINS = np.array(['gmail.com', 'yahoo.com', 'outlook.com'], dtype=object)
+# The cities warehouse.py knows the state of (see cities.py)
+CITIES = np.array(list(CITY_STATES), dtype=object)
+
+# Category: (brands, items, price range)
+CATALOG = {
+    'Electronics': (['Samsung', 'Apple', 'Sony', 'HP', 'Dell', 'OnePlus', 'Boat'],
+                    ['Smartphone', 'Laptop', 'Headphones', 'Monitor', 'TV', 'Earbuds', 'Tablet'], (999, 89999)),
+    'Fashion': (['Nike', "Levi's", 'Adidas', 'Puma', 'Woodland', 'H&M', 'Reebok'],
+                ['Running Shoes', 'Jeans', 'T-Shirt', 'Sneakers', 'Shirt', 'Trackpants', 'Jacket'], (499, 7999)),
+    'Groceries': (['Organic', 'Tata', 'Fortune', 'Aashirvaad', 'Daawat'],
+                  ['Almonds 500g', 'Basmati Rice 5kg', 'Honey 500g', 'Masoor Dal 1kg', 'Atta 10kg'], (49, 1499)),
+}
+CATEGORIES = np.array(list(CATALOG), dtype=object)
+
+STATUSES = np.array(['Completed', 'Pending', 'Cancelled'], dtype=object)
+STATUS_WEIGHTS = [0.8, 0.12, 0.08]
+
+# One seed stream per file, so the files don't share random numbers
+FILE_STREAMS = {'customers_raw.csv': 1, 'products_raw.csv': 2, 'sales_raw.csv': 3}
+
+
+def parse_size(text):
+    """Rows for '10k' / '1m' / '50m' / '250000'"""
+    text = str(text).lower().replace('_', '')
+    if text in SIZES:
+        return SIZES[text]
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+def dataset_shape(sales_rows):
+    """(customers, products) generated next to sales_rows sales"""
+    return max(25, sales_rows // 50), max(20, sales_rows // 500)
+
+
+def prefixed_ids(prefix, numbers):
+    """'C001'-style IDs (at least 3 digits, like the sample files) as an object array"""
+    return np.char.add(prefix, np.char.zfill(numbers.astype(str), 3)).astype(object)
+
+
+def formatted_dates(rng, days, count):
+    """count random dates of days, each written in one of DATE_FORMATS"""
+    table = np.stack([days.strftime(fmt).to_numpy(dtype=object) for fmt in DATE_FORMATS])
+    return table[rng.integers(0, len(DATE_FORMATS), count), rng.integers(0, len(days), count)]
+
+
+def messy_case(rng, values):
+    """Values with DIRT['messy_case'] of them lower-cased, upper-cased or padded with spaces"""
+    values = values.copy()
+    messy = np.flatnonzero(rng.random(len(values)) < DIRT['messy_case'])
+    styles = rng.integers(0, 3, len(messy))
+    for style, transform in enumerate([np.char.lower, np.char.upper, lambda v: np.char.add(np.char.add(' ', v), ' ')]):
+        rows = messy[styles == style]
+        if len(rows):
+            values[rows] = transform(values[rows].astype(str)).astype(object)
+    return values
+
+
+def blank(rng, values, rate):
+    """values with a share of rate set to missing"""
+    values = values.astype(object)
+    values[rng.random(len(values)) < rate] = None
+    return values
+
+
+def with_duplicates(rng, frame):
+    """Overwrite DIRT['duplicate_rows'] of the rows with exact copies of other rows"""
+    rows = np.arange(len(frame))
+    repeats = np.flatnonzero(rng.random(len(frame)) < DIRT['duplicate_rows'])
+    rows[repeats] = rng.integers(0, len(frame), len(repeats))
+    return frame.iloc[rows]
+
+
+def product_catalog(products, seed):
+    """(category index, list price as '45999.00') of every product, shared by the products and sales files
+
+    Prices are formatted once here: formatting floats is most of to_csv's time.
+    """
+    rng = np.random.default_rng([seed, FILE_STREAMS['products_raw.csv'], 0])
+    categories = rng.integers(0, len(CATEGORIES), products)
+    prices = np.empty(products)
+    for number, (_, _, (low, high)) in enumerate(CATALOG.values()):
+        in_category = categories == number
+        prices[in_category] = rng.integers(low, high + 1, in_category.sum())
+    return categories, np.char.mod('%.2f', prices).astype(object)
+
+
+def customers_chunk(rng, start, count, customers, products, catalog):
+    numbers = np.arange(start + 1, start + count + 1)
+    first = FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), count)]
+    last = LAST_NAMES[rng.integers(0, len(LAST_NAMES), count)]
+    email = (np.char.lower(first.astype(str)).astype(object) + '.' + np.char.lower(last.astype(str)).astype(object)
+             + numbers.astype(str).astype(object) + '@' + EMAIL_DOMAINS[rng.integers(0, len(EMAIL_DOMAINS), count)])
+
+    # 9876543210, +91-9876543210, 09876543210 or +919876543210
+    digits = rng.integers(6_000_000_000, 10_000_000_000, count).astype(str).astype(object)
+    phone_prefixes = np.array(['', '+91-', '0', '+91'], dtype=object)
+    phone = phone_prefixes[rng.choice(len(phone_prefixes), count, p=[0.55, 0.2, 0.15, 0.1])] + digits
+
+    ids = prefixed_ids('C', numbers)
+    unprefixed = rng.random(count) < DIRT['unprefixed_id']
+    ids[unprefixed] = np.char.zfill(numbers[unprefixed].astype(str), 3).astype(object)
+
+    return with_duplicates(rng, pd.DataFrame({
+        'customer_id': ids,
+        'first_name': first,
+        'last_name': last,
+        'email': blank(rng, email, DIRT['missing_email']),
+        'phone': phone,
+        'city': messy_case(rng, CITIES[rng.integers(0, len(CITIES), count)]),
+        'registration_date': formatted_dates(rng, REGISTRATION_DAYS, count),
+    }))
+
+
+def products_chunk(rng, start, count, customers, products, catalog):
+    numbers = np.arange(start + 1, start + count + 1)
+    categories, list_prices = catalog[0][start:start + count], catalog[1][start:start + count]
+    names = np.empty(count, dtype=object)
+    for number, (brands, items, _) in enumerate(CATALOG.values()):
+        in_category = np.flatnonzero(categories == number)
+        brand = np.array(brands, dtype=object)[rng.integers(0, len(brands), len(in_category))]
+        item = np.array(items, dtype=object)[rng.integers(0, len(items), len(in_category))]
+        names[in_category] = brand + ' ' + item
+
+    stock = pd.array(rng.integers(0, 500, count), dtype='Int64')
+    stock[rng.random(count) < DIRT['missing_stock']] = pd.NA
+
+    return with_duplicates(rng, pd.DataFrame({
+        'product_id': prefixed_ids('P', numbers),
+        'product_name': names,
+        'category': messy_case(rng, CATEGORIES[categories]),
+        'price': blank(rng, list_prices, DIRT['missing_price']),
+        'stock_quantity': stock,
+    }))
+
+
+def sales_chunk(rng, start, count, customers, products, catalog):
+    numbers = np.arange(start + 1, start + count + 1)
+    customer_numbers = rng.integers(1, customers + 1, count)
+    product_numbers = rng.integers(1, products + 1, count)
+
+    # A few sales of customers / products that were never registered
+    unknown = rng.random(count) < DIRT['unknown_reference']
+    customer_numbers[unknown] += customers
+    unknown = rng.random(count) < DIRT['unknown_reference']
+    product_numbers[unknown] += products
+
+    unit_price = catalog[1][(product_numbers - 1) % products]
+
+    return with_duplicates(rng, pd.DataFrame({
+        'transaction_id': prefixed_ids('T', numbers),
+        'customer_id': blank(rng, prefixed_ids('C', customer_numbers), DIRT['missing_id']),
+        'product_id': blank(rng, prefixed_ids('P', product_numbers), DIRT['missing_id']),
+        'quantity': rng.integers(1, 6, count),
+        'unit_price': unit_price,
+        'transaction_date': blank(rng, formatted_dates(rng, SALE_DAYS, count), DIRT['missing_date']),
+        'status': blank(rng, STATUSES[rng.choice(len(STATUSES), count, p=STATUS_WEIGHTS)], DIRT['missing_status']),
+    }))
+
+
+def write_file(path, make_chunk, rows, seed, shape, catalog, chunk_rows=CHUNK_ROWS):
+    """Write rows generated by make_chunk to path, chunk_rows at a time"""
+    stream = FILE_STREAMS[os.path.basename(path)]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for number, start in enumerate(range(0, rows, chunk_rows)):
+            # Stream 0 of products_raw.csv is taken by product_catalog
+            rng = np.random.default_rng([seed, stream, number + 1])
+            chunk = make_chunk(rng, start, min(chunk_rows, rows - start), *shape, catalog)
+            chunk.to_csv(f, index=False, header=number == 0)
+
+
+def generate_dataset(output_dir, sales_rows, seed=42, chunk_rows=CHUNK_ROWS):
+    """Write the three raw files for sales_rows sales to output_dir, returns {file: rows}"""
+    os.makedirs(output_dir, exist_ok=True)
+    customers, products = dataset_shape(sales_rows)
+    catalog = product_catalog(products, seed)
+
+    files = {
+        'customers_raw.csv': (customers_chunk, customers),
+        'products_raw.csv': (products_chunk, products),
+        'sales_raw.csv': (sales_chunk, sales_rows),
+    }
+    for name, (make_chunk, rows) in files.items():
+        write_file(os.path.join(output_dir, name), make_chunk, rows, seed, (customers, products), catalog, chunk_rows)
+    return {name: rows for name, (_, rows) in files.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=parse_size, default=SIZES['10k'],
+                        help=f"sales rows, a number or one of {', '.join(SIZES)} (default: 10k)")
+    parser.add_argument('--output-dir', default='.', help="where the three files are written (default: here)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate_dataset(args.output_dir, args.rows, args.seed)
+    for name, rows in counts.items():
+        print(f"✓ {os.path.join(args.output_dir, name)}: {rows:,} rows")
+    print(f"✓ Generated in {time.perf_counter() - start:.1f}s (seed {args.seed})")
+
+
+if __name__ == "__main__":
+    main()
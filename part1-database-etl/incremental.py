@@ -0,0 +1,187 @@
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from defaults import DEFAULT_STATE_DIR
+from streaming import SeenIds
+
+# Persisted state for incremental (delta) loads.
+#
+# The state directory holds:
+#   manifest.json          size, mtime and content hashes of each source file,
+#                          plus the sales watermark and next order_item_id
+#   <table>_hashes.npz     natural ID -> hash of the cleaned row, per dimension table
+#   seen_transactions.npz  every transaction ID read so far (for cross-run dedup)
+
+# Bytes read at a time when hashing a file
+HASH_BLOCK_BYTES = 1024 * 1024
+
+UNCHANGED = 'unchanged'
+APPENDED = 'appended'
+CHANGED = 'changed'
+
+
+def file_sha256(path):
+    """Content hash of a whole file"""
+    return prefix_sha256(path, 0)[1]
+
+
+def prefix_sha256(path, size):
+    """(content hash of the first `size` bytes, content hash of the whole file), in one pass"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        remaining = size
+        while remaining > 0:
+            block = f.read(min(HASH_BLOCK_BYTES, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+        prefix = digest.hexdigest()
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return prefix, digest.hexdigest()
+
+
+def read_csv_tail(path, offset, chunk_size, dtype=None):
+    """Read only the rows after byte offset (which must be a line boundary), in chunks"""
+    columns = pd.read_csv(path, quotechar='"', skipinitialspace=True, nrows=0).columns
+    handle = open(path, 'rb')
+    handle.seek(offset)
+    return pd.read_csv(io.TextIOWrapper(handle, newline=''), names=columns, header=None,
+                       quotechar='"', skipinitialspace=True, dtype=dtype, chunksize=chunk_size)
+
+
+class IncrementalState:
+    """Manifest, row hashes and dedup state carried from one run to the next
+
+    Nothing is written until save() is called, so a failed load leaves the
+    previous state in place and the next run retries the same delta.
+    """
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR):
+        self.state_dir = state_dir
+        self.manifest_path = os.path.join(state_dir, 'manifest.json')
+        self.is_fresh = not os.path.exists(self.manifest_path)
+
+        self.manifest = {'files': {}, 'next_order_item_id': 1}
+        if not self.is_fresh:
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+        self.row_hashes = {}
+        self._seen_transactions = None
+        # path -> (size, mtime_ns, content hash) worked out by file_status, reused by record_file
+        self._file_hashes = {}
+
+    # Source files
+
+    def file_status(self, path):
+        """UNCHANGED, APPENDED (same bytes up to the last watermark, then more) or CHANGED
+
+        Unless size and mtime are the same as last time, the bytes up to the
+        watermark are hashed whole and compared with the hash of the file as
+        it was loaded, so an edit anywhere before the watermark is CHANGED.
+        """
+        entry = self.manifest['files'].get(path)
+        # An entry without a hash is stale, like no entry at all
+        if entry is None or 'sha256' not in entry:
+            return CHANGED
+
+        stat = os.stat(path)
+        if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+            return UNCHANGED
+        if stat.st_size < entry['size']:
+            return CHANGED
+
+        prefix, whole = prefix_sha256(path, entry['size'])
+        self._file_hashes[path] = (stat.st_size, stat.st_mtime_ns, whole)
+        if prefix != entry['sha256']:
+            return CHANGED
+        # Same size and bytes: touched but not modified
+        return APPENDED if stat.st_size > entry['size'] else UNCHANGED
+
+    def watermark(self, path):
+        """Byte offset up to which the file has already been loaded"""
+        return self.manifest['files'][path]['size']
+
+    def record_file(self, path):
+        """Remember the file as loaded up to its current size, with the content hash of all of it"""
+        stat = os.stat(path)
+        size, mtime_ns, content_hash = self._file_hashes.get(path, (None, None, None))
+        if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            content_hash = file_sha256(path)
+        self.manifest['files'][path] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': content_hash,
+        }
+
+    # Dimension tables
+
+    def _load_hashes(self, table):
+        if table not in self.row_hashes:
+            path = os.path.join(self.state_dir, f'{table}_hashes.npz')
+            if os.path.exists(path):
+                stored = np.load(path)
+                self.row_hashes[table] = (stored['ids'], stored['hashes'])
+            else:
+                self.row_hashes[table] = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64))
+        return self.row_hashes[table]
+
+    def changed_rows(self, table, df, key):
+        """Return only the rows of df that are new or differ from the last run, keyed on `key`"""
+        df = df[df[key].notna()]
+        ids = df[key].to_numpy().astype(np.int64)
+        # Hash with an int64 key so a float/int dtype change alone doesn't count as a change
+        hashes = pd.util.hash_pandas_object(df.assign(**{key: ids}), index=False).to_numpy()
+
+        stored_ids, stored_hashes = self._load_hashes(table)
+        positions = np.searchsorted(stored_ids, ids).clip(max=max(len(stored_ids) - 1, 0))
+        unchanged = np.zeros(len(ids), dtype=bool)
+        if len(stored_ids):
+            unchanged = (stored_ids[positions] == ids) & (stored_hashes[positions] == hashes)
+
+        # Merge into the stored hashes (kept sorted by ID)
+        kept = ~np.isin(stored_ids, ids)
+        merged_ids = np.concatenate([stored_ids[kept], ids])
+        merged_hashes = np.concatenate([stored_hashes[kept], hashes])
+        order = np.argsort(merged_ids, kind='stable')
+        self.row_hashes[table] = (merged_ids[order], merged_hashes[order])
+
+        return df[~unchanged]
+
+    def known_ids(self, table):
+        """Every natural ID of the table loaded so far (including this run)"""
+        return self._load_hashes(table)[0]
+
+    # Sales
+
+    @property
+    def seen_transactions(self):
+        if self._seen_transactions is None:
+            path = os.path.join(self.state_dir, 'seen_transactions.npz')
+            self._seen_transactions = SeenIds.load(path) if os.path.exists(path) else SeenIds()
+        return self._seen_transactions
+
+    def reset_sales(self):
+        """Forget sales history, for when sales_raw.csv was rewritten rather than appended to"""
+        self._seen_transactions = SeenIds()
+        self.manifest['next_order_item_id'] = 1
+
+    def save(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+
+        for table, (ids, hashes) in self.row_hashes.items():
+            np.savez(os.path.join(self.state_dir, f'{table}_hashes.npz'), ids=ids, hashes=hashes)
+
+        if self._seen_transactions is not None:
+            self._seen_transactions.save(os.path.join(self.state_dir, 'seen_transactions.npz'))
+
+        # Manifest last: it is what marks the run as done
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
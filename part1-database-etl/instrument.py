@@ -0,0 +1,218 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from defaults import DEFAULT_RUN_RECORD
+from streaming import peak_rss_mb
+
+# Per-stage instrumentation: wall and CPU time, rows in/out, rows/second and
+# peak memory for every block wrapped in measure(), optionally with a cProfile
+# dump per stage.
+#
+# Records are collected per thread; the scheduler ships the records of stages
+# that ran in a worker back to the caller (see scheduler.run_stages), and the
+# run's records end up in a JSON run record next to the text report.
+#
+# Peak RSS and cProfile are both process-wide. A block's peak is only
+# reported when no other thread of the process had a block open while it
+# ran (its peak would be theirs too, and resetting it clears theirs), and
+# only blocks in the main thread are profiled, as Python 3.12+ allows one
+# profiler per process. Stages run with --serial, or in worker processes,
+# get both.
+
+# Set by configure(); copied into worker processes by the scheduler
+settings = {'profile_dir': None}
+
+_local = threading.local()
+
+# Open blocks of every thread (thread ident -> that thread's open records)
+_open_blocks = {}
+_open_lock = threading.Lock()
+
+
+def configure(profile_dir=None):
+    """Turn cProfile dumps (<profile_dir>/<stage>.prof) on or off for this process"""
+    settings['profile_dir'] = profile_dir
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+
+
+def _state():
+    if not hasattr(_local, 'records'):
+        _local.records = []
+        _local.open = []
+    return _local
+
+
+def collect():
+    """Return and forget the records finished in this thread so far"""
+    state = _state()
+    records, state.records = state.records, []
+    return records
+
+
+def call_collecting(func, args, worker_settings=None):
+    """Run func(*args) and return (result, records of the blocks it measured)
+
+    Used by the scheduler in worker processes and threads; worker_settings
+    carries the caller's settings into a worker process.
+    """
+    if worker_settings is not None:
+        settings.update(worker_settings)
+    state = _state()
+    saved, state.records = state.records, []
+    try:
+        result = func(*args)
+        return result, state.records
+    finally:
+        state.records = saved
+
+
+def _forget_other_threads():
+    # Only the forking thread lives on in a forked worker process
+    global _open_lock
+    _open_lock = threading.Lock()
+    _open_blocks.clear()
+
+
+os.register_at_fork(after_in_child=_forget_other_threads)
+
+
+def _open_block(state, record):
+    """Push record on this thread's open blocks, returns whether another thread has a block open
+
+    If so, this block and the open blocks of the other threads are all
+    marked as overlapping.
+    """
+    ident = threading.get_ident()
+    with _open_lock:
+        others = [records for other, records in _open_blocks.items() if other != ident and records]
+        if others:
+            record['_overlapped'] = True
+            for records in others:
+                for other_record in records:
+                    other_record['_overlapped'] = True
+        state.open.append(record)
+        _open_blocks[ident] = state.open
+    return bool(others)
+
+
+def _close_block(state):
+    """Pop this thread's innermost open block, returns whether another thread's block overlapped it"""
+    with _open_lock:
+        record = state.open.pop()
+        if not state.open:
+            _open_blocks.pop(threading.get_ident(), None)
+    return record.pop('_overlapped', False)
+
+
+def _start_profiler(name):
+    """An enabled cProfile.Profile for stage `name`, or None when it can't be profiled here"""
+    if threading.current_thread() is not threading.main_thread():
+        print(f"  (not profiling {name}: it runs in a worker thread, use --serial to profile it)")
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler is active (one per process on Python 3.12+)
+        print(f"  (not profiling {name}: {e})")
+        return None
+    return profiler
+
+
+def _reset_peak_rss():
+    """Reset the process's peak RSS (VmHWM) so the next reading covers only what follows
+
+    Linux only; elsewhere peaks stay cumulative for the process.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+@contextmanager
+def measure(name, rows_in=None):
+    """Measure the enclosed block as stage `name`, yields the record
+
+    Set record['rows_in'] / record['rows_out'] inside the block when they are
+    only known there. Nested blocks are recorded too (with 'parent' set).
+    Peak memory is the process's peak RSS while the block ran; it is None
+    when a block in another thread of the process overlapped it.
+    """
+    state = _state()
+    record = {
+        'stage': name,
+        'parent': state.open[-1]['stage'] if state.open else None,
+        'rows_in': rows_in,
+        'rows_out': None,
+    }
+
+    # Only the outermost block is profiled: one profiler at a time
+    outermost = not state.open
+    if state.open:
+        # Keep the enclosing block's peak so far, the reset below clears it
+        parent = state.open[-1]
+        parent['_children_peak'] = max(parent.get('_children_peak', 0), peak_rss_mb() or 0)
+    if not _open_block(state, record):
+        _reset_peak_rss()
+    profiler = _start_profiler(name) if settings['profile_dir'] and outermost else None
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield record
+    finally:
+        if profiler:
+            profiler.disable()
+        record['wall_s'] = time.perf_counter() - wall_start
+        record['cpu_s'] = time.thread_time() - cpu_start
+        peak = peak_rss_mb()
+        children_peak = record.pop('_children_peak', 0)
+        overlapped = _close_block(state)
+        record['peak_rss_mb'] = None if overlapped else max(peak or 0, children_peak) or None
+        rows = record['rows_in'] if record['rows_in'] is not None else record['rows_out']
+        record['rows_per_s'] = rows / record['wall_s'] if rows is not None and record['wall_s'] > 0 else None
+        record['pid'] = os.getpid()
+
+        if profiler:
+            path = os.path.join(settings['profile_dir'], f'{name}.prof')
+            profiler.dump_stats(path)
+            record['profile'] = path
+
+        if state.open:
+            # Pass this block's peak on to the enclosing block
+            parent = state.open[-1]
+            parent['_children_peak'] = max(parent.get('_children_peak', 0), record['peak_rss_mb'] or 0)
+        state.records.append(record)
+
+
+def run_peak_rss_mb(records):
+    """Largest peak RSS over the records (any process) and this process right now"""
+    peaks = [record['peak_rss_mb'] for record in records if record['peak_rss_mb']] + [peak_rss_mb() or 0]
+    return max(peaks) or None
+
+
+def _json_default(value):
+    # numpy scalars in the metrics dicts
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_run_record(records, path=DEFAULT_RUN_RECORD, **run_info):
+    """Write the machine-readable record of a run: run_info fields plus one entry per stage"""
+    run_record = dict(run_info)
+    run_record['peak_rss_mb'] = run_peak_rss_mb(records)
+    run_record['stages'] = records
+    with open(path, 'w') as f:
+        json.dump(run_record, f, indent=2, default=_json_default)
+    return path
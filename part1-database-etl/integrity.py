@@ -0,0 +1,175 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from defaults import DEFAULT_REJECT_FILE
+
+# Foreign key validation for the fact tables.
+#
+# Keys are held as sorted int64 arrays and looked up with a direct-address
+# bitmap when they are dense (the usual case for surrogate-style IDs) or
+# np.searchsorted otherwise, so checking tens of millions of rows never
+# builds Python sets. Every rejected row keeps a reason code and can be written to a
+# reject file next to the report.
+
+# Keys use a bitmap lookup when the largest key is at most this many times the number of keys
+DENSE_KEY_RATIO = 8
+
+# ID columns of each table, cast to nullable integers before validation
+ID_COLUMNS = {
+    'orders': ['order_id', 'customer_id'],
+    'order_items': ['order_item_id', 'order_id', 'product_id'],
+}
+
+# Reject reasons; rows carry the position in this list as an int8 code (0 = valid)
+REASONS = [
+    'valid',
+    'missing_customer_id',
+    'unknown_customer_id',
+    'missing_order_id',
+    'unknown_order_id',
+    'rejected_order',
+    'missing_product_id',
+    'unknown_product_id',
+]
+(VALID, MISSING_CUSTOMER, UNKNOWN_CUSTOMER, MISSING_ORDER, UNKNOWN_ORDER,
+ REJECTED_ORDER, MISSING_PRODUCT, UNKNOWN_PRODUCT) = range(len(REASONS))
+
+
+def to_nullable_ids(df, columns):
+    """Cast ID columns (float with NaN after extraction) to a nullable integer dtype"""
+    df = df.copy(deep=False)
+    for column in columns:
+        ids = df[column]
+        if pd.api.types.is_extension_array_dtype(ids.dtype) and ids.dtype.kind in 'iu':
+            # Already nullable (Int32/Int64 from schema.TABLE_DTYPES), keep its width
+            continue
+        if ids.dtype.kind == 'f':
+            # Build the masked array directly, astype('Int64') re-checks every value is integral
+            missing = ids.isna().to_numpy()
+            df[column] = pd.arrays.IntegerArray(ids.fillna(0).to_numpy().astype(np.int64), missing)
+        else:
+            df[column] = ids.astype('Int64')
+    return df
+
+
+def sorted_keys(ids):
+    """Sorted int64 array of the non-null values of ids (Series or array)"""
+    ids = pd.Series(ids).dropna()
+    return np.sort(ids.to_numpy(dtype=np.int64))
+
+
+def contains(keys, ids):
+    """Vectorized membership test of a nullable ID Series against sorted_keys output
+
+    Returns (missing, found) boolean arrays; null IDs are missing, never found.
+    """
+    missing = ids.isna().to_numpy()
+    values = ids.to_numpy(dtype=np.int64, na_value=-1)
+    if len(keys) == 0:
+        return missing, np.zeros(len(values), dtype=bool)
+
+    if keys[0] >= 0 and keys[-1] <= DENSE_KEY_RATIO * len(keys):
+        bitmap = np.zeros(keys[-1] + 1, dtype=bool)
+        bitmap[keys] = True
+        in_range = (values >= 0) & (values <= keys[-1])
+        found = np.zeros(len(values), dtype=bool)
+        found[in_range] = bitmap[values[in_range]]
+        return missing, found
+
+    positions = np.searchsorted(keys, values).clip(max=len(keys) - 1)
+    found = (keys[positions] == values) & ~missing
+    return missing, found
+
+
+def reject_reasons(df, checks):
+    """Reason code per row (VALID when every check passes) for [(column, keys, missing code, unknown code)]
+
+    All foreign key columns are tested in one pass and combined with
+    np.select, so the first failing column decides the reason.
+    """
+    conditions, choices = [], []
+    for column, keys, missing_reason, unknown_reason in checks:
+        missing, found = contains(keys, df[column])
+        conditions += [missing, ~found]
+        choices += [missing_reason, unknown_reason]
+    return np.select(conditions, choices, default=VALID).astype(np.int8)
+
+
+def validate_foreign_keys(customer_ids, product_ids, orders, order_items):
+    """Split orders/order_items into rows with valid references and rejected rows
+
+    Returns (orders, order_items, rejects); rejects has the rejected rows of
+    both tables with 'table' and 'reason' columns in front.
+    """
+    orders = to_nullable_ids(orders, ID_COLUMNS['orders'])
+    order_items = to_nullable_ids(order_items, ID_COLUMNS['order_items'])
+
+    order_reasons = reject_reasons(orders, [
+        ('customer_id', sorted_keys(customer_ids), MISSING_CUSTOMER, UNKNOWN_CUSTOMER),
+    ])
+    valid_orders = orders[order_reasons == VALID]
+
+    item_reasons = reject_reasons(order_items, [
+        ('order_id', sorted_keys(orders['order_id']), MISSING_ORDER, UNKNOWN_ORDER),
+        ('product_id', sorted_keys(product_ids), MISSING_PRODUCT, UNKNOWN_PRODUCT),
+    ])
+    # Items of an order that was itself rejected
+    _, order_kept = contains(sorted_keys(valid_orders['order_id']), order_items['order_id'])
+    item_reasons[(item_reasons == VALID) & ~order_kept] = REJECTED_ORDER
+    valid_order_items = order_items[item_reasons == VALID]
+
+    rejects = pd.concat([
+        _rejected_rows('orders', orders, order_reasons),
+        _rejected_rows('order_items', order_items, item_reasons),
+    ], ignore_index=True)
+
+    return valid_orders, valid_order_items, rejects
+
+
+def _rejected_rows(table, df, reasons):
+    rejected = reasons != VALID
+    return pd.concat([
+        pd.DataFrame({
+            'table': pd.Categorical.from_codes(np.full(int(rejected.sum()), list(ID_COLUMNS).index(table)),
+                                               categories=list(ID_COLUMNS)),
+            'reason': pd.Categorical.from_codes(reasons[rejected], categories=REASONS),
+        }),
+        df[rejected].reset_index(drop=True),
+    ], axis=1)
+
+
+def reject_counts(rejects):
+    """{'<table>.<reason>': rows} for the rejects frame returned by validate_foreign_keys"""
+    counts = rejects.groupby(['table', 'reason'], observed=True).size()
+    return {f'{table}.{reason}': int(rows) for (table, reason), rows in counts.items()}
+
+
+def write_rejects(rejects, path=DEFAULT_REJECT_FILE):
+    """Write rejected rows to Parquet, or CSV when the path ends in .csv or no Parquet engine is installed
+
+    Returns the path written.
+    """
+    if path.endswith('.parquet'):
+        try:
+            rejects.to_parquet(path, index=False)
+            return path
+        except ImportError:
+            path = path[:-len('.parquet')] + '.csv'
+    rejects.to_csv(path, index=False)
+    return path
+
+
+def clear_rejects(path=DEFAULT_REJECT_FILE):
+    """Remove the reject file of an earlier run (and its CSV fallback), so stale rejects never look current
+
+    Returns the paths removed.
+    """
+    paths = [path]
+    if path.endswith('.parquet'):
+        paths.append(path[:-len('.parquet')] + '.csv')
+    removed = [candidate for candidate in paths if os.path.exists(candidate)]
+    for candidate in removed:
+        os.remove(candidate)
+    return removed
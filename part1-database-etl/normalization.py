@@ -0,0 +1,209 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Shared, vectorized cleanup helpers used by the transform stage.
+# Each function takes a whole column (Series) and returns a new Series with
+# exactly the same values and dtype as the old per-row Series.apply versions.
+#
+# Digits are picked out with pandas' vectorized string methods (str.replace,
+# str.len, str slicing), which work value by value, so one very long value
+# costs only its own length instead of widening a whole block of rows.
+
+# Longest digit run that still fits in int64 (longer values use the per-row fallback)
+MAX_ID_DIGITS = 18
+
+PHONE_PREFIX = '+91-'
+PHONE_DIGITS = 10
+
+NON_DIGITS = r'\D'
+
+
+def _factorize(series):
+    """Return (codes, unique values) so each distinct ID is only parsed once
+
+    Object columns mixing types are not factorized, since 1 and 1.0 hash
+    the same but str() differently.
+    """
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) != 'string':
+        return np.where(series.isna().to_numpy(), -1, np.arange(len(series))), series.to_numpy()
+    codes, uniques = pd.factorize(series)
+    return codes, np.asarray(uniques)
+
+
+def extract_numeric_ids(series):
+    """Extract numeric part from IDs like C001, P002, T003 for a whole column
+
+    Missing values and IDs without any digits become NaN, so the result is
+    int64 when every ID is valid and float64 otherwise (same as .apply did).
+    """
+    if series.empty:
+        return series.apply(_extract_numeric_id)
+
+    codes, uniques = _factorize(series)
+    digits = pd.Series(uniques, dtype=object).astype(str).str.replace(NON_DIGITS, '', regex=True)
+    lengths = digits.str.len().to_numpy()
+    if lengths.max(initial=0) > MAX_ID_DIGITS:
+        return series.apply(_extract_numeric_id)
+
+    # One spare slot at the end is what code -1 (missing value) points to
+    numbers = np.zeros(len(uniques) + 1, dtype=np.int64)
+    has_digits = np.zeros(len(uniques) + 1, dtype=bool)
+    has_digits[:-1] = lengths > 0
+    # (astype reads digits with int(), non-ASCII ones included, like the fallback)
+    numbers[:-1][has_digits[:-1]] = digits[has_digits[:-1]].astype(np.int64).to_numpy()
+
+    keep = has_digits[codes]
+    numbers = numbers[codes]
+    if not keep.any():
+        # .apply returning only None keeps an object column of None
+        return pd.Series([None] * len(series), index=series.index, dtype=object, name=series.name)
+    if keep.all():
+        return pd.Series(numbers, index=series.index, name=series.name)
+
+    return pd.Series(np.where(keep, numbers, np.nan), index=series.index, name=series.name)
+
+
+def _extract_numeric_id(id_value):
+    """Per-row fallback for values the vectorized path can't handle"""
+    if pd.isna(id_value):
+        return None
+    numeric_part = re.sub(r'\D', '', str(id_value))
+    return int(numeric_part) if numeric_part else None
+
+
+def standardize_phones(series):
+    """Standardize phone formats to +91-XXXXXXXXXX for a whole column
+
+    10 digits are prefixed with +91-, longer numbers keep their last 10
+    digits, anything shorter is left untouched and missing values become None.
+    """
+    if series.empty:
+        return series.apply(_standardize_phone)
+
+    digits = series.astype(str).str.replace(NON_DIGITS, '', regex=True)
+    # 10 digits or more: prefix the last 10 (exactly 10 is the whole number)
+    formatted = (PHONE_PREFIX + digits.str[-PHONE_DIGITS:]).to_numpy()
+    long_enough = (digits.str.len() >= PHONE_DIGITS).to_numpy()
+
+    missing = series.isna().to_numpy()
+    result = series.astype(object).to_numpy(copy=True)
+    replace = long_enough & ~missing
+    result[replace] = formatted[replace]
+    result[missing] = None
+
+    return pd.Series(result, index=series.index, name=series.name).infer_objects()
+
+
+def _standardize_phone(phone):
+    """Per-row fallback for values the vectorized path can't handle"""
+    if pd.isna(phone):
+        return None
+    digits = re.sub(r'\D', '', str(phone))
+    if len(digits) == PHONE_DIGITS:
+        return f'{PHONE_PREFIX}{digits}'
+    elif len(digits) > PHONE_DIGITS:
+        return f'{PHONE_PREFIX}{digits[-PHONE_DIGITS:]}'
+    return phone
+
+
+# Date formats tried in order, the first one that parses wins
+DATE_FORMATS = [
+    '%Y-%m-%d',      # 2023-01-15
+    '%d/%m/%Y',      # 15/01/2023
+    '%m/%d/%Y',      # 01/15/2023
+    '%d-%m-%Y',      # 15-01-2023
+    '%m-%d-%Y',      # 01-15-2023
+    '%Y/%m/%d',      # 2023/01/15
+    '%d.%m.%Y',      # 15.01.2023
+    '%Y%m%d'         # 20230115
+]
+
+# Hit-count keys for values no explicit format matched
+AUTO_DETECTED = 'auto-detected'
+UNPARSED = 'unparsed'
+
+
+class DateNormalizer:
+    """Batched multi-format date parser that converts a column to YYYY-MM-DD
+
+    The whole column is parsed one format at a time and only the values
+    still unparsed are handed to the next format, so precedence is the same
+    as trying each format per row. Results are cached per raw string and
+    reused across calls, and `hits` counts how many rows each format parsed.
+    """
+
+    def __init__(self, formats=DATE_FORMATS, output_format='%Y-%m-%d'):
+        self.formats = list(formats)
+        self.output_format = output_format
+        self.cache = {}
+        self.hits = dict.fromkeys(self.formats + [AUTO_DETECTED, UNPARSED], 0)
+
+    def normalize(self, series):
+        """Return the column as YYYY-MM-DD strings, None where it can't be parsed"""
+        if series.empty:
+            return series.apply(lambda value: self._parse_one(value)[0])
+
+        if series.dtype != object or pd.api.types.infer_dtype(series, skipna=True) != 'string':
+            # Non-text columns are rare, keep the exact per-row behaviour
+            parsed = [self._parse_one(value) for value in series]
+            self._count([source for _, source in parsed])
+            return pd.Series([result for result, _ in parsed], index=series.index, dtype=object, name=series.name)
+
+        codes, uniques = pd.factorize(series)
+        results = np.full(len(uniques) + 1, None, dtype=object)
+        sources = np.full(len(uniques) + 1, None, dtype=object)
+
+        pending = []
+        for position, raw in enumerate(uniques):
+            if raw in self.cache:
+                results[position], sources[position] = self.cache[raw]
+            else:
+                pending.append(position)
+
+        pending = np.asarray(pending, dtype=np.int64)
+        for fmt in self.formats:
+            if len(pending) == 0:
+                break
+            parsed = pd.to_datetime(pd.Series(uniques[pending], dtype=object), format=fmt, errors='coerce')
+            matched = parsed.notna().to_numpy()
+            results[pending[matched]] = parsed[matched].dt.strftime(self.output_format).to_numpy()
+            sources[pending[matched]] = fmt
+            pending = pending[~matched]
+
+        # If none of the formats work, try pandas auto-detection one value at a time
+        for position in pending:
+            results[position], sources[position] = self._auto_detect(uniques[position])
+
+        for position, raw in enumerate(uniques):
+            self.cache[raw] = (results[position], sources[position])
+
+        # Rows are counted once per occurrence, missing values (code -1) are not counted
+        present = codes >= 0
+        self._count(sources[codes[present]])
+
+        return pd.Series(results[codes], index=series.index, dtype=object, name=series.name)
+
+    def _parse_one(self, value):
+        """Per-value path: try each format in turn, returns (result, source)"""
+        if pd.isna(value):
+            return None, None
+
+        for fmt in self.formats:
+            try:
+                return pd.to_datetime(value, format=fmt).strftime(self.output_format), fmt
+            except Exception:
+                continue
+
+        return self._auto_detect(value)
+
+    def _auto_detect(self, value):
+        try:
+            return pd.to_datetime(value).strftime(self.output_format), AUTO_DETECTED
+        except Exception:
+            return None, UNPARSED
+
+    def _count(self, sources):
+        for source, count in pd.Series(sources, dtype=object).value_counts(dropna=True).items():
+            self.hits[source] = self.hits.get(source, 0) + int(count)
@@ -0,0 +1,495 @@
+"""Profile the raw input files before the pipeline runs on them
+
+For every column of customers_raw.csv, products_raw.csv and sales_raw.csv
+(or any CSV files given): null rate, distinct count, invalid formats
+(emails, phones, dates and numbers) with examples, and a histogram of the
+values (the most common values, value ranges for numbers, or value lengths
+for high-cardinality text).
+
+Each file is cut into byte-range shards that are profiled in a process pool
+and merged; see profile_files. The text report keeps the layout of
+data_quality_report.txt, and the same figures are written as JSON.
+
+Usage: python profiling.py [customers_raw.csv products_raw.csv sales_raw.csv] [--workers 4]
+                           [--report data_profile_report.txt] [--json data_profile.json] [--serial]
+"""
+import argparse
+import io
+import json
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from normalization import DateNormalizer, UNPARSED
+from staging import raw_dtypes
+
+# Data profiling engine for the raw CSV files.
+#
+# A file is split into byte ranges (shards) that each start at a line
+# boundary, so workers parse their part of the file on their own, BLOCK_BYTES
+# at a time. Every shard yields one ColumnProfile per column, and profiles
+# merge: counts add up, distinct-value sketches combine, and the invalid
+# value examples are the lowest ones. So the profile is the same whatever
+# the number of shards and workers. Quoted values spanning several lines are not supported.
+
+DEFAULT_FILES = ['customers_raw.csv', 'products_raw.csv', 'sales_raw.csv']
+DEFAULT_REPORT = 'data_profile_report.txt'
+DEFAULT_JSON = 'data_profile.json'
+
+# Bytes parsed at a time within a shard, and the bounds of a shard's size
+BLOCK_BYTES = 16 * 1024**2
+MIN_SHARD_BYTES = 4 * 1024**2
+MAX_SHARD_BYTES = 256 * 1024**2
+
+# Distinct values counted exactly up to this many per column, estimated with
+# HyperLogLog beyond (2**HLL_PRECISION registers, about 0.8% standard error)
+EXACT_DISTINCT = 100_000
+HLL_PRECISION = 14
+
+# Columns with at most this many distinct values get a histogram of their values
+MAX_TRACKED_VALUES = 50
+TOP_VALUES = 10
+HISTOGRAM_BINS = 10
+# Numbers are counted per bucket of this many significant digits (re-binned for the report)
+BUCKET_DIGITS = 3
+INVALID_EXAMPLES = 5
+
+EMAIL = 'email'
+PHONE = 'phone'
+DATE = 'date'
+NUMBER = 'number'
+TEXT = 'text'
+
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s]+\.[A-Za-z]{2,}')
+# 10 digits, optionally after +91 / +91- / 91 / 0 (the forms standardize_phones accepts)
+PHONE_PATTERN = re.compile(r'(?:\+91-?|91|0)?\d{10}')
+
+# Rows read to decide the kind of columns that aren't named after one, and the
+# share of them that must be numbers for a NUMBER column (the rest is invalid)
+SAMPLE_ROWS = 1000
+NUMERIC_SHARE = 0.9
+
+
+def column_kind(name, sample, dtype=None):
+    """Kind of check for a column: EMAIL / PHONE / DATE by name, NUMBER by known dtype or sample, else TEXT"""
+    lowered = name.lower()
+    if 'email' in lowered:
+        return EMAIL
+    if 'phone' in lowered:
+        return PHONE
+    if lowered == 'date' or lowered.endswith('_date'):
+        return DATE
+    if dtype is not None:
+        return NUMBER if pd.api.types.is_numeric_dtype(pd.Series(dtype=dtype)) else TEXT
+    values = sample.dropna()
+    if len(values) and pd.to_numeric(values, errors='coerce').notna().mean() >= NUMERIC_SHARE:
+        return NUMBER
+    return TEXT
+
+
+def read_block(data, columns):
+    """Parse CSV bytes without a header, every column as text"""
+    return pd.read_csv(io.BytesIO(data), header=None, names=columns, dtype=str, quotechar='"', skipinitialspace=True)
+
+
+def file_layout(path):
+    """(columns, {column: kind}, byte offset of the first data row)"""
+    sample = pd.read_csv(path, dtype=str, quotechar='"', skipinitialspace=True, nrows=SAMPLE_ROWS)
+    dtypes = raw_dtypes(path) or {}
+    kinds = {column: column_kind(column, sample[column], dtypes.get(column)) for column in sample.columns}
+    with open(path, 'rb') as f:
+        f.readline()
+        return list(sample.columns), kinds, f.tell()
+
+
+def shard_ranges(size, data_start, workers):
+    """[(start, end)] byte ranges of the data rows, at least one per worker for files big enough"""
+    data_bytes = max(0, size - data_start)
+    count = max(math.ceil(data_bytes / MAX_SHARD_BYTES), min(workers, math.ceil(data_bytes / MIN_SHARD_BYTES)), 1)
+    bounds = [data_start + data_bytes * number // count for number in range(count + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_shard_blocks(path, start, end, data_start, block_bytes=BLOCK_BYTES):
+    """Bytes of the lines that start in [start, end), block_bytes (plus the end of a line) at a time"""
+    with open(path, 'rb') as f:
+        if start > data_start:
+            # The line running over start belongs to the previous shard
+            f.seek(start - 1)
+            f.readline()
+        else:
+            f.seek(start)
+        position = f.tell()
+        while position < end:
+            data = f.read(min(block_bytes, end - position))
+            if not data:
+                break
+            if not data.endswith(b'\n'):
+                data += f.readline()
+            position = f.tell()
+            yield data
+
+
+class DistinctCounter:
+    """Distinct values seen: exact up to EXACT_DISTINCT, a HyperLogLog sketch beyond
+
+    Values are identified by a 64-bit hash (pandas' hash_array, the same in
+    every process), so counters of different shards merge.
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+
+    def add(self, values):
+        hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+        self._add_hashes(hashes)
+
+    def _add_hashes(self, hashes):
+        if self.hashes is not None:
+            self.hashes = np.union1d(self.hashes, hashes)
+            if len(self.hashes) > EXACT_DISTINCT:
+                self.hashes = None
+        # Register: the top bits of the hash; rank: position of the first 1 bit in the rest
+        rest_bits = 64 - self.precision
+        index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        rank = (rest_bits - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        if self.hashes is not None and other.hashes is not None:
+            self.hashes = np.union1d(self.hashes, other.hashes)
+            if len(self.hashes) > EXACT_DISTINCT:
+                self.hashes = None
+        else:
+            self.hashes = None
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @property
+    def exact(self):
+        return self.hashes is not None
+
+    def count(self):
+        if self.exact:
+            return len(self.hashes)
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+def _bit_length(values):
+    """Bit length of each uint64 (split in 32-bit halves, which float64 holds exactly)"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+def _add_counts(counts, new):
+    for key, count in new.items():
+        counts[key] = counts.get(key, 0) + int(count)
+
+
+class ColumnProfile:
+    """Mergeable statistics of one column (see update and merge)"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.nulls = 0
+        self.distinct = DistinctCounter()
+        self.invalid = 0
+        self.invalid_examples = []
+        # {raw value: rows} while there are at most MAX_TRACKED_VALUES of them, None after
+        self.values = {}
+        # Value lengths (text columns), numeric buckets and range (number columns), formats (date columns)
+        self.lengths = {}
+        self.buckets = {}
+        self.minimum = self.maximum = None
+        self.total = 0.0
+        self.numbers = 0
+        self.date_formats = {}
+
+    def update(self, series):
+        """Add a column of raw text values (NaN for missing)"""
+        self.rows += len(series)
+        counts = series.value_counts(dropna=True)
+        # Whitespace-only values count as missing (empty ones already are NaN)
+        blank = np.asarray(counts.index.str.isspace(), dtype=bool)
+        if blank.any():
+            counts = counts[~blank]
+        self.nulls += len(series) - int(counts.sum())
+        if counts.empty:
+            return
+        uniques = counts.index.to_numpy(dtype=object)
+
+        self.distinct.add(uniques)
+        if self.values is not None:
+            if len(counts) > MAX_TRACKED_VALUES:
+                self.values = None
+            else:
+                _add_counts(self.values, counts)
+                if len(self.values) > MAX_TRACKED_VALUES:
+                    self.values = None
+
+        valid = self._check(uniques, counts.to_numpy())
+        if valid is not None:
+            self._record_invalid(uniques[~valid], counts.to_numpy()[~valid])
+        if self.kind != NUMBER:
+            _add_counts(self.lengths, counts.groupby(counts.index.str.len()).sum())
+
+    def _check(self, uniques, counts):
+        """Which unique values have a valid format (None for columns without a format)"""
+        if self.kind == TEXT:
+            return None
+        text = pd.Series(uniques, dtype=object).str.strip()
+        if self.kind == EMAIL:
+            return text.str.fullmatch(EMAIL_PATTERN).to_numpy(dtype=bool)
+        if self.kind == PHONE:
+            return text.str.replace(r'[\s()]', '', regex=True).str.fullmatch(PHONE_PATTERN).to_numpy(dtype=bool)
+        if self.kind == DATE:
+            normalizer = DateNormalizer()
+            normalizer.normalize(text)
+            sources = np.array([normalizer.cache[value][1] for value in text], dtype=object)
+            valid = sources != UNPARSED
+            _add_counts(self.date_formats, pd.Series(counts[valid]).groupby(sources[valid]).sum())
+            return valid
+        if self.kind == NUMBER:
+            numbers = pd.to_numeric(text, errors='coerce').to_numpy(dtype=np.float64)
+            valid = ~np.isnan(numbers)
+            self._add_numbers(numbers[valid], counts[valid])
+            return valid
+
+    def _add_numbers(self, numbers, counts):
+        if not len(numbers):
+            return
+        self.minimum = min(numbers.min(), self.minimum if self.minimum is not None else np.inf)
+        self.maximum = max(numbers.max(), self.maximum if self.maximum is not None else -np.inf)
+        self.total += float(np.dot(numbers, counts))
+        self.numbers += int(counts.sum())
+        _add_counts(self.buckets, pd.Series(counts).groupby(_bucket(numbers)).sum())
+
+    def _record_invalid(self, values, counts):
+        self.invalid += int(counts.sum())
+        self.invalid_examples = _examples(self.invalid_examples, values)
+
+    def merge(self, other):
+        """Add the statistics of another part of the same column"""
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        self.invalid += other.invalid
+        self.invalid_examples = _examples(self.invalid_examples, other.invalid_examples)
+        if self.values is not None and other.values is not None:
+            _add_counts(self.values, other.values)
+            if len(self.values) > MAX_TRACKED_VALUES:
+                self.values = None
+        else:
+            self.values = None
+        _add_counts(self.lengths, other.lengths)
+        _add_counts(self.buckets, other.buckets)
+        _add_counts(self.date_formats, other.date_formats)
+        if other.minimum is not None:
+            self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+            self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        self.total += other.total
+        self.numbers += other.numbers
+        return self
+
+    def histogram(self):
+        """(kind, [(label, rows)]): the most common values, numeric ranges or value lengths"""
+        if self.values is not None:
+            top = sorted(self.values.items(), key=lambda item: (-item[1], item[0]))[:TOP_VALUES]
+            # Values with stray whitespace are quoted, so 'Mumbai ' doesn't look like 'Mumbai'
+            return 'values', [(value if value == value.strip() else repr(value), rows) for value, rows in top]
+        if self.kind == NUMBER and self.buckets:
+            return 'ranges', _rebin(self.buckets, self.minimum, self.maximum)
+        return 'lengths', [(str(length), rows) for length, rows in sorted(self.lengths.items())]
+
+    def to_dict(self):
+        present = self.rows - self.nulls
+        result = {
+            'kind': self.kind,
+            'rows': self.rows,
+            'nulls': self.nulls,
+            'null_rate': self.nulls / self.rows if self.rows else 0.0,
+            'distinct': self.distinct.count(),
+            'distinct_exact': self.distinct.exact,
+        }
+        if self.kind != TEXT:
+            result['invalid'] = self.invalid
+            result['invalid_rate'] = self.invalid / present if present else 0.0
+            result['invalid_examples'] = self.invalid_examples
+        if self.kind == NUMBER and self.numbers:
+            result.update(min=float(self.minimum), max=float(self.maximum), mean=self.total / self.numbers)
+        if self.kind == DATE:
+            result['date_formats'] = dict(self.date_formats)
+        kind, bins = self.histogram()
+        result['histogram'] = {'kind': kind, 'bins': [[label, rows] for label, rows in bins]}
+        return result
+
+
+def _examples(examples, values):
+    """The first INVALID_EXAMPLES of the distinct values in sorted order (the same however the file is split)"""
+    return sorted(set(examples).union(str(value) for value in values))[:INVALID_EXAMPLES]
+
+
+def _bucket(numbers):
+    """Lower bound of each number's bucket: the number cut to BUCKET_DIGITS significant digits"""
+    magnitude = np.floor(np.log10(np.abs(np.where(numbers == 0, 1, numbers))))
+    step = 10.0 ** (magnitude - (BUCKET_DIGITS - 1))
+    return np.where(numbers == 0, 0.0, np.floor(numbers / step) * step)
+
+
+def _rebin(buckets, minimum, maximum, bins=HISTOGRAM_BINS):
+    """[(range label, rows)] of equal-width ranges between minimum and maximum (buckets go by their lower bound)"""
+    decimals = 0 if max(abs(minimum), abs(maximum)) >= 100 else 2
+    if minimum == maximum:
+        return [(f"{minimum:,.{decimals}f}", sum(buckets.values()))]
+    edges = np.linspace(minimum, maximum, bins + 1)
+    rows = np.zeros(bins, dtype=np.int64)
+    lower = np.clip(np.array(list(buckets), dtype=np.float64), minimum, maximum)
+    positions = np.clip(np.searchsorted(edges, lower, side='right') - 1, 0, bins - 1)
+    np.add.at(rows, positions, np.array(list(buckets.values()), dtype=np.int64))
+    return [(f"{edges[number]:,.{decimals}f} - {edges[number + 1]:,.{decimals}f}", int(rows[number]))
+            for number in range(bins)]
+
+
+def profile_shard(path, columns, kinds, start, end, data_start, block_bytes=BLOCK_BYTES):
+    """{column: ColumnProfile} of the rows in one byte range of a file"""
+    profiles = {column: ColumnProfile(kinds[column]) for column in columns}
+    for data in iter_shard_blocks(path, start, end, data_start, block_bytes):
+        block = read_block(data, columns)
+        for column in columns:
+            profiles[column].update(block[column])
+    return profiles
+
+
+def profile_files(paths=DEFAULT_FILES, workers=None, serial=False, block_bytes=BLOCK_BYTES):
+    """Profile each file, returns {path: {'rows', 'bytes', 'shards', 'columns': {column: ColumnProfile}}}
+
+    The shards of all files go to one process pool (workers processes,
+    default: one per core); serial=True profiles them one after the other
+    in this process instead, with the same result.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = []
+    for path in paths:
+        columns, kinds, data_start = file_layout(path)
+        for start, end in shard_ranges(os.path.getsize(path), data_start, 1 if serial else workers):
+            tasks.append((path, columns, kinds, start, end, data_start, block_bytes))
+
+    if serial or len(tasks) == 1:
+        shards = [profile_shard(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(profile_shard, *zip(*tasks)))
+
+    profiles = {}
+    for task, shard in zip(tasks, shards):
+        path = task[0]
+        if path not in profiles:
+            profiles[path] = {'bytes': os.path.getsize(path), 'shards': 0, 'columns': shard}
+        else:
+            for column, profile in shard.items():
+                profiles[path]['columns'][column].merge(profile)
+        profiles[path]['shards'] += 1
+    for profile in profiles.values():
+        profile['rows'] = next(iter(profile['columns'].values())).rows if profile['columns'] else 0
+    return profiles
+
+
+def profile_to_dict(profiles, seconds=None, workers=None):
+    return {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'seconds': seconds,
+        'workers': workers,
+        'files': {path: {'rows': profile['rows'], 'bytes': profile['bytes'], 'shards': profile['shards'],
+                         'columns': {column: column_profile.to_dict()
+                                     for column, column_profile in profile['columns'].items()}}
+                  for path, profile in profiles.items()},
+    }
+
+
+def format_report(profile_dict):
+    """Text report of profile_to_dict's output, in the layout of data_quality_report.txt"""
+    lines = []
+    lines.append("="*70)
+    lines.append("DATA PROFILE - FLEXIMART RAW FILES")
+    lines.append("="*70)
+    lines.append(f"Report Generated: {profile_dict['generated'].replace('T', ' ')}")
+    if profile_dict['seconds'] is not None:
+        lines.append(f"Profiled in {profile_dict['seconds']:.2f}s with {profile_dict['workers']} worker(s)")
+    lines.append("")
+
+    for path, profile in profile_dict['files'].items():
+        lines.append("-"*70)
+        lines.append(f"{os.path.basename(path).upper()} ({profile['rows']} rows, {profile['bytes'] / 1024**2:.1f} MB, "
+                     f"{profile['shards']} shard(s))")
+        lines.append("-"*70)
+        lines.append(f"{'column':<20} {'kind':<7} {'null %':>7} {'distinct':>11} {'invalid':>9} {'invalid %':>9}")
+        for column, stats in profile['columns'].items():
+            distinct = f"{'' if stats['distinct_exact'] else '~'}{stats['distinct']}"
+            invalid = f"{stats['invalid']:>9} {stats['invalid_rate'] * 100:>8.2f}%" if 'invalid' in stats \
+                else f"{'-':>9} {'-':>9}"
+            lines.append(f"{column:<20} {stats['kind']:<7} {stats['null_rate'] * 100:>6.2f}% {distinct:>11} {invalid}")
+
+        for column, stats in profile['columns'].items():
+            lines.append("")
+            histogram = stats['histogram']
+            summary = f"{column} ({histogram['kind']})"
+            if 'mean' in stats:
+                summary += f": min {stats['min']:g}, max {stats['max']:g}, mean {stats['mean']:.2f}"
+            lines.append(summary)
+            present = stats['rows'] - stats['nulls']
+            for label, rows in histogram['bins']:
+                share = rows / present * 100 if present else 0.0
+                lines.append(f"  {label:<29} {rows:>10} {share:>6.1f}%")
+            for date_format, rows in stats.get('date_formats', {}).items():
+                lines.append(f"  parsed as {date_format:<19} {rows:>10}")
+            if stats.get('invalid_examples'):
+                lines.append(f"  invalid e.g. {', '.join(repr(value) for value in stats['invalid_examples'])}")
+        lines.append("")
+
+    lines.append("="*70)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*', default=DEFAULT_FILES,
+                        help="CSV files with a header row (default: the three raw files)")
+    parser.add_argument('--workers', type=int, default=None, help="profiling processes (default: one per core)")
+    parser.add_argument('--serial', action='store_true', help="profile in this process, one shard after the other")
+    parser.add_argument('--report', default=DEFAULT_REPORT, help=f"text report (default: {DEFAULT_REPORT})")
+    parser.add_argument('--json', default=DEFAULT_JSON, help=f"JSON form of the report (default: {DEFAULT_JSON})")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    workers = 1 if args.serial else (args.workers or os.cpu_count() or 1)
+    profiles = profile_files(args.files, workers, args.serial)
+    profile_dict = profile_to_dict(profiles, time.perf_counter() - start, workers)
+
+    report_text = format_report(profile_dict)
+    with open(args.report, 'w') as f:
+        f.write(report_text)
+    with open(args.json, 'w') as f:
+        json.dump(profile_dict, f, indent=2)
+
+    print(report_text)
+    print(f"\n✓ Data profile saved to '{args.report}' and '{args.json}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# Pre-aggregated rollups of fact_sales for the analytics queries.
+#
+#   agg_sales_month_product    one row per month x product
+#   agg_sales_month_customer   one row per month x customer
+#
+# month_key is YYYYMM (date_key // 100), so the first day of a month in
+# dim_date is month_key * 100 + 1. A full warehouse load builds the rollups
+# in pandas from the fact frame; incremental loads only recompute the months
+# whose date_keys they touched, from fact_sales, inside the same transaction.
+
+ROLLUP_DDL = {
+    'agg_sales_month_product': """
+        CREATE TABLE agg_sales_month_product (
+            month_key INT NOT NULL,
+            product_key INT NOT NULL,
+            total_amount DECIMAL(15,2) NOT NULL,
+            quantity_sold BIGINT NOT NULL,
+            sale_count INT NOT NULL,
+            PRIMARY KEY (month_key, product_key)
+        )""",
+    'agg_sales_month_customer': """
+        CREATE TABLE agg_sales_month_customer (
+            month_key INT NOT NULL,
+            customer_key INT NOT NULL,
+            total_amount DECIMAL(15,2) NOT NULL,
+            quantity_sold BIGINT NOT NULL,
+            sale_count INT NOT NULL,
+            PRIMARY KEY (month_key, customer_key)
+        )""",
+}
+
+# Per-key totals over all months (product revenue share, customer segments)
+# come straight from these; month ranges use the primary key
+ROLLUP_INDEXES = {
+    'agg_sales_month_product': [
+        ('idx_agg_month_product_totals', ['product_key', 'quantity_sold', 'total_amount']),
+    ],
+    'agg_sales_month_customer': [
+        ('idx_agg_month_customer_totals', ['customer_key', 'quantity_sold', 'total_amount']),
+    ],
+}
+
+# Rollup table: the fact_sales key it is grouped by (besides the month)
+ROLLUP_KEYS = {
+    'agg_sales_month_product': 'product_key',
+    'agg_sales_month_customer': 'customer_key',
+}
+
+
+def month_keys(date_keys):
+    """Sorted distinct YYYYMM month keys of the YYYYMMDD date keys"""
+    return np.unique(np.asarray(date_keys, dtype=np.int64) // 100)
+
+
+def build_rollups(fact_sales):
+    """{rollup table: DataFrame} aggregated from a fact_sales frame"""
+    # Each amount is rounded to whole cents and the cents are summed as
+    # integers, so the totals are exact like DECIMAL sums in the database
+    # (float sums drift: 20,000 x 1234.56 came out as 24691201.17)
+    amounts = fact_sales['total_amount'].to_numpy(dtype=np.float64)
+    facts = pd.DataFrame({
+        'month_key': (fact_sales['date_key'].to_numpy() // 100).astype(np.int32),
+        'product_key': fact_sales['product_key'].to_numpy(),
+        'customer_key': fact_sales['customer_key'].to_numpy(),
+        'total_cents': np.round(amounts * 100).astype(np.int64),
+        'quantity_sold': fact_sales['quantity_sold'].to_numpy(dtype=np.int64),
+    })
+
+    rollups = {}
+    for table, key in ROLLUP_KEYS.items():
+        rollup = facts.groupby(['month_key', key], sort=True).agg(
+            total_cents=('total_cents', 'sum'),
+            quantity_sold=('quantity_sold', 'sum'),
+            sale_count=('quantity_sold', 'size'),
+        ).reset_index()
+        rollup.insert(2, 'total_amount', rollup.pop('total_cents') / 100)
+        rollups[table] = rollup
+    return rollups
+
+
+def refresh_rollups(cursor, months):
+    """Recompute the rollup rows of the given YYYYMM months from fact_sales
+
+    Runs on a DB-API cursor so it shares the caller's transaction: the rows
+    of every month are deleted and re-aggregated, one range scan of
+    fact_sales (on its date_key index) per month and rollup.
+    """
+    months = [int(month) for month in months]
+    if not months:
+        return
+    month_list = ', '.join(str(month) for month in months)
+
+    for table, key in ROLLUP_KEYS.items():
+        cursor.execute(f"DELETE FROM {table} WHERE month_key IN ({month_list})")
+        for month in months:
+            cursor.execute(
+                f"INSERT INTO {table} (month_key, {key}, total_amount, quantity_sold, sale_count) "
+                f"SELECT {month}, {key}, SUM(total_amount), SUM(quantity_sold), COUNT(*) FROM fact_sales "
+                f"WHERE date_key BETWEEN {month * 100 + 1} AND {month * 100 + 31} GROUP BY {key}"
+            )
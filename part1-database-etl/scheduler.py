@@ -0,0 +1,102 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import instrument
+
+# A small DAG scheduler for pipeline stages.
+#
+# Each Stage names the stages it depends on. A stage starts as soon as all of
+# its dependencies are done, in a process pool (CPU-bound pandas work), a
+# thread pool (database I/O) or inline in the scheduling thread. With
+# serial=True the same graph runs one stage at a time in dependency order.
+# Whatever the stages measure with instrument.measure() is collected from
+# the workers and returned with the results.
+
+PROCESS = 'process'
+THREAD = 'thread'
+INLINE = 'inline'
+
+
+class Stage:
+    """One unit of work in the pipeline graph
+
+    func is called with *args followed by the results of the `inputs` stages
+    (in that order). `after` lists extra stages that must finish first but
+    whose results aren't needed. Process stages need a picklable func/args.
+    """
+
+    def __init__(self, name, func, args=(), inputs=(), after=(), pool=THREAD):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.inputs = list(inputs)
+        self.depends_on = set(inputs) | set(after)
+        self.pool = pool
+
+
+def _topological_order(stages):
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = stage.depends_on - set(by_name)
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s) {sorted(missing)}")
+
+    order, done = [], set()
+    while len(order) < len(stages):
+        ready = [stage for stage in stages if stage.name not in done and stage.depends_on <= done]
+        if not ready:
+            raise ValueError("Stage dependencies contain a cycle")
+        # Keep declaration order among ready stages so serial runs are predictable
+        order.append(ready[0])
+        done.add(ready[0].name)
+    return order
+
+
+def run_stages(stages, serial=False, max_workers=None):
+    """Run a stage graph, returns ({stage name: result}, [instrument records of all stages])
+
+    The first stage that raises stops the run and the error is re-raised.
+    """
+    order = _topological_order(stages)
+    results, records = {}, []
+
+    def call_args(stage):
+        return stage.args + tuple(results[name] for name in stage.inputs)
+
+    def finish(stage, outcome):
+        results[stage.name], stage_records = outcome
+        records.extend(stage_records)
+
+    if serial:
+        for stage in order:
+            finish(stage, instrument.call_collecting(stage.func, call_args(stage)))
+        return results, records
+
+    pending = list(order)
+    running = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as processes, ThreadPoolExecutor(max_workers=max_workers) as threads:
+        pools = {PROCESS: processes, THREAD: threads}
+        try:
+            while pending or running:
+                for stage in [stage for stage in pending if stage.depends_on <= results.keys()]:
+                    pending.remove(stage)
+                    if stage.pool == INLINE:
+                        finish(stage, instrument.call_collecting(stage.func, call_args(stage)))
+                    else:
+                        future = pools[stage.pool].submit(instrument.call_collecting, stage.func, call_args(stage),
+                                                          dict(instrument.settings))
+                        running[future] = stage
+
+                # An inline stage may have unblocked others, schedule those before waiting
+                if any(stage.depends_on <= results.keys() for stage in pending):
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    finish(stage, future.result())
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+
+    return results, records
@@ -0,0 +1,64 @@
+import pandas as pd
+
+# In-memory dtypes of the cleaned tables, following schema_documentation.md.
+#
+#   INT ids          nullable Int64 (source IDs like C3000000001 carry ten
+#                    digits, past Int32); order_item_id is generated, so
+#                    never missing
+#   INT quantities   Int32 / int32
+#   DECIMAL(10,2)    float64 (float32 drops cents on amounts past about
+#                    131,072, and its sums drift further)
+#   VARCHAR          category for low-cardinality text, object otherwise
+#   DATE             category ('YYYY-MM-DD' strings, a few hundred per year)
+
+TABLE_DTYPES = {
+    'customers': {
+        'customer_id': 'Int64',
+        'first_name': object,
+        'last_name': object,
+        'email': object,
+        'phone': object,
+        'city': 'category',
+        'registration_date': 'category',
+    },
+    'products': {
+        'product_id': 'Int64',
+        'product_name': object,
+        'category': 'category',
+        'price': 'float64',
+        'stock_quantity': 'int32',
+    },
+    'orders': {
+        'order_id': 'Int64',
+        'customer_id': 'Int64',
+        'order_date': 'category',
+        'total_amount': 'float64',
+        'status': 'category',
+    },
+    'order_items': {
+        'order_item_id': 'int64',
+        'order_id': 'Int64',
+        'product_id': 'Int64',
+        'quantity': 'Int32',
+        'unit_price': 'float64',
+        'subtotal': 'float64',
+    },
+}
+
+
+def apply_table_dtypes(df, table):
+    """Cast the columns of a cleaned table to their compact dtypes (columns not in the map are kept)"""
+    dtypes = {column: dtype for column, dtype in TABLE_DTYPES[table].items() if column in df.columns}
+    return df.astype(dtypes)
+
+
+def to_plain_ints(ids):
+    """Integer ID column without a null mask (nullable Int keeps its width, anything else becomes int64)"""
+    if pd.api.types.is_extension_array_dtype(ids.dtype) and ids.dtype.kind in 'iu':
+        return ids.astype(ids.dtype.numpy_dtype)
+    return ids.astype(int)
+
+
+def memory_mb(*frames):
+    """Total memory_usage(deep=True) of the frames in MB"""
+    return sum(int(df.memory_usage(deep=True).sum()) for df in frames) / 1024 / 1024
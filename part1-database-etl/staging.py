@@ -0,0 +1,204 @@
+import csv
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from defaults import DEFAULT_CACHE_DIR, STAGING_FORMATS
+from incremental import file_sha256
+
+# Columnar staging cache between EXTRACT and TRANSFORM.
+#
+# Each raw CSV is parsed once with explicit dtypes and kept as a Parquet (or
+# Feather) file under the cache directory, next to a small JSON entry with
+# the source's path, size, mtime and content hash. Later runs read the
+# columnar copy (memory-mapped) instead of parsing the CSV again, as long as
+# the source is unchanged.
+
+# Dtypes of the raw files, by file name (types as loaded, before cleaning).
+# Only the text columns are forced when parsing (see parse_dtypes): numeric
+# columns are left to read_csv, which reads them as numbers, or as text when
+# a value isn't one, and the transforms coerce them.
+RAW_DTYPES = {
+    'customers_raw.csv': {
+        'customer_id': object,
+        'first_name': object,
+        'last_name': object,
+        'email': object,
+        'phone': object,
+        'city': object,
+        'registration_date': object,
+    },
+    'products_raw.csv': {
+        'product_id': object,
+        'product_name': object,
+        'category': object,
+        'price': 'float64',
+        'stock_quantity': 'float64',
+    },
+    'sales_raw.csv': {
+        'transaction_id': object,
+        'customer_id': object,
+        'product_id': object,
+        'quantity': 'Int64',
+        'unit_price': 'float64',
+        'transaction_date': object,
+        'status': object,
+    },
+}
+
+# Bumped whenever RAW_DTYPES or the parse options change, so old cache files are not reused
+CACHE_VERSION = 2
+
+HIT = 'hit'
+MISS = 'miss'
+INVALIDATED = 'invalidated'
+
+
+def raw_dtypes(path):
+    """Explicit dtypes for a raw CSV file, None for files without a known layout
+
+    Files are recognised by name, or by their header row when they were
+    renamed (e.g. an input path given on the etl_pipeline command line).
+    """
+    dtypes = RAW_DTYPES.get(os.path.basename(path))
+    if dtypes is None and os.path.isfile(path):
+        with open(path, newline='') as f:
+            header = next(csv.reader(f, skipinitialspace=True), [])
+        dtypes = next((layout for layout in RAW_DTYPES.values() if list(layout) == header), None)
+    return dtypes
+
+
+def parse_dtypes(path):
+    """The dtypes forced when parsing a raw CSV file: its text columns, as object (None for unknown files)
+
+    A single malformed quantity or price would fail a forced numeric dtype
+    for the whole file, so numeric columns are left to read_csv.
+    """
+    dtypes = raw_dtypes(path)
+    if dtypes is None:
+        return None
+    return {column: dtype for column, dtype in dtypes.items() if dtype is object}
+
+
+def read_source_csv(path, **options):
+    """Parse a raw CSV file with the pipeline's parse options and explicit dtypes"""
+    return pd.read_csv(path, quotechar='"', skipinitialspace=True, dtype=parse_dtypes(path), **options)
+
+
+class StagingCache:
+    """Typed columnar copies of the raw CSV files, reused while the source is unchanged
+
+    A cached copy is used when the source has the same size and mtime as when
+    it was staged, or the same content hash (e.g. after a touch or checkout).
+    Anything else re-parses the CSV and replaces the cached copy.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, file_format='parquet'):
+        if file_format not in STAGING_FORMATS:
+            raise ValueError(f"Unknown staging format '{file_format}', expected one of {STAGING_FORMATS}")
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("The staging cache needs pyarrow (pip install pyarrow)")
+        self.cache_dir = cache_dir
+        self.file_format = file_format
+        self.status = {}
+
+    def _file_prefix(self, path):
+        # One entry per source file, named after its absolute path
+        key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+        return f'{os.path.splitext(os.path.basename(path))[0]}-{key}'
+
+    def _entry_path(self, path):
+        return os.path.join(self.cache_dir, self._file_prefix(path) + '.json')
+
+    def _load_entry(self, path):
+        entry_path = self._entry_path(path)
+        if not os.path.exists(entry_path):
+            return None
+        with open(entry_path) as f:
+            return json.load(f)
+
+    def _is_current(self, path, entry):
+        if entry.get('version') != CACHE_VERSION or entry.get('format') != self.file_format:
+            return False
+        if not os.path.exists(os.path.join(self.cache_dir, entry['data_file'])):
+            return False
+
+        stat = os.stat(path)
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        # Same size but touched: only the content hash can tell
+        if file_sha256(path) != entry['sha256']:
+            return False
+        entry['mtime_ns'] = stat.st_mtime_ns
+        self._save_entry(path, entry)
+        return True
+
+    def _save_entry(self, path, entry):
+        with open(self._entry_path(path), 'w') as f:
+            json.dump(entry, f, indent=2)
+
+    def read_csv(self, path):
+        """Return the raw CSV as a DataFrame, from the cache when the source is unchanged"""
+        entry = self._load_entry(path)
+        if entry is not None and self._is_current(path, entry):
+            self.status[path] = HIT
+            return self._read_data(os.path.join(self.cache_dir, entry['data_file']))
+
+        self.status[path] = MISS if entry is None else INVALIDATED
+        # Stat and hash before parsing, so a file modified mid-parse looks stale next time
+        stat = os.stat(path)
+        content_hash = file_sha256(path)
+        df = read_source_csv(path)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data_file = f'{self._file_prefix(path)}-{content_hash[:16]}.{self.file_format}'
+        self._write_data(df, os.path.join(self.cache_dir, data_file))
+        if entry is not None and entry['data_file'] != data_file:
+            # Drop the copy of the previous version (or format) of the file
+            stale_path = os.path.join(self.cache_dir, entry['data_file'])
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+
+        self._save_entry(path, {
+            'version': CACHE_VERSION,
+            'format': self.file_format,
+            'source': os.path.abspath(path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': content_hash,
+            'data_file': data_file,
+        })
+        return df
+
+    def _write_data(self, df, data_path):
+        # Write to a temp name first so an interrupted run never leaves a truncated file behind
+        temp_path = data_path + '.tmp'
+        if self.file_format == 'parquet':
+            df.to_parquet(temp_path, index=False)
+        else:
+            # Uncompressed so numeric columns can be used straight from the memory map
+            df.to_feather(temp_path, compression='uncompressed')
+        os.replace(temp_path, data_path)
+
+    def _read_data(self, data_path):
+        from pyarrow import feather, parquet
+
+        if self.file_format == 'parquet':
+            table = parquet.read_table(data_path, memory_map=True)
+        else:
+            table = feather.read_table(data_path, memory_map=True)
+        df = table.to_pandas()
+        # Arrow hands back missing strings as None; the CSV parser gives NaN
+        for column in df.columns[df.dtypes == object]:
+            if table.column(column).null_count:
+                values = df[column].to_numpy(copy=True)
+                values[table.column(column).is_null().to_numpy(zero_copy_only=False)] = np.nan
+                df[column] = values
+        return df
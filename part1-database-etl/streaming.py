@@ -0,0 +1,118 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Helpers for the chunked (streaming) mode of the pipeline, where sales_raw.csv
+# is read and transformed a fixed number of rows at a time instead of all at once.
+
+# Most sorted runs SeenIds keeps before merging its newest ones
+MAX_RUNS = 8
+
+
+def read_csv_chunks(path, chunk_size, dtype=None):
+    """Read a raw CSV file lazily, chunk_size rows at a time"""
+    return pd.read_csv(path, quotechar='"', skipinitialspace=True, dtype=dtype, chunksize=chunk_size)
+
+
+class SeenIds:
+    """Remembers which numeric IDs were already seen in earlier chunks
+
+    Used for drop_duplicates(keep='first') across chunks. IDs are kept in
+    a few sorted int64 runs, like a log-structured merge tree: each chunk
+    adds a run of its new IDs, and the newest run is merged into the one
+    before it while it is at least as large, or while there are more than
+    MAX_RUNS runs. So each ID is merged about log2(IDs) times at most and
+    lookups search a handful of runs. Memory is 8 bytes per distinct ID
+    seen, whatever the IDs' values.
+    """
+
+    def __init__(self):
+        self.runs = []
+        self.seen_missing = False
+
+    def save(self, path):
+        np.savez(path, ids=self._merged(), seen_missing=self.seen_missing)
+
+    @classmethod
+    def load(cls, path):
+        seen = cls()
+        stored = np.load(path)
+        ids = stored['ids']
+        seen.runs = [ids.astype(np.int64)] if len(ids) else []
+        seen.seen_missing = bool(stored['seen_missing'])
+        return seen
+
+    def first_occurrences(self, series):
+        """Return a boolean mask of rows whose ID was not seen before, then remember them
+
+        Like drop_duplicates, missing IDs count as equal to each other.
+        """
+        first = ~series.duplicated(keep='first').to_numpy()
+        missing = series.isna().to_numpy()
+
+        if self.seen_missing:
+            first &= ~missing
+        self.seen_missing = self.seen_missing or bool(missing.any())
+
+        ids = series.to_numpy()[~missing].astype(np.int64)
+        # Sorted lookups walk each run in order instead of jumping around it
+        order = np.argsort(ids)
+        ids = ids[order]
+        found = self._contains(ids)
+        seen = np.zeros(len(series), dtype=bool)
+        seen[np.flatnonzero(~missing)[order]] = found
+
+        new_ids = ids[~found]
+        self._add(new_ids[np.r_[True, new_ids[1:] != new_ids[:-1]]] if len(new_ids) else new_ids)
+
+        return first & ~seen
+
+    def _contains(self, ids):
+        found = np.zeros(len(ids), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, ids), len(run) - 1)
+            found |= run[positions] == ids
+        return found
+
+    def _add(self, new_ids):
+        """Add sorted IDs that none of the runs holds yet"""
+        if len(new_ids) == 0:
+            return
+        self.runs.append(new_ids)
+        while len(self.runs) > 1 and (len(self.runs[-1]) >= len(self.runs[-2]) or len(self.runs) > MAX_RUNS):
+            newer = self.runs.pop()
+            older = self.runs.pop()
+            # Disjoint sorted runs back to back, numpy's stable sort handles that in about linear time
+            self.runs.append(np.sort(np.concatenate([older, newer]), kind='stable'))
+
+    def _merged(self):
+        if not self.runs:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(self.runs), kind='stable')
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, None where not available"""
+    # VmHWM is reset on exec, unlike ru_maxrss which keeps the parent's peak
+    # when started through fork + exec (e.g. from subprocess)
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return peak / 1024 / 1024
+    return peak / 1024
@@ -0,0 +1,397 @@
+import numpy as np
+import pandas as pd
+
+from bulk_load import bulk_load, upsert_rows, LOAD_STRATEGIES, DEFAULT_BATCH_SIZE
+from cities import CITY_STATES
+from integrity import DENSE_KEY_RATIO
+from rollups import ROLLUP_DDL, ROLLUP_INDEXES, build_rollups, refresh_rollups, month_keys
+
+# Star schema builder for fleximart_dw (see part3-datawarehouse).
+#
+# The dimensions and fact table are built from the cleaned, validated frames
+# of the ETL run, entirely with vectorized pandas/numpy operations:
+#
+#   dim_date       every day of the years covered by the orders (date_range)
+#   dim_product    one row per product, product_key = 1..n in product_id order
+#   dim_customer   one row per customer, customer_key likewise
+#   fact_sales     one row per order item: order items merged once with their
+#                  orders, natural IDs swapped for surrogate keys through
+#                  in-memory lookup arrays (no per-row SELECTs)
+#   agg_sales_*    month x product / month x customer rollups (see rollups.py)
+#
+# Surrogate keys are assigned here rather than by AUTO_INCREMENT, so the fact
+# rows can reference them before anything is loaded. The tables are then
+# bulk loaded with the same machinery as the OLTP tables (bulk_load.py).
+# Incremental runs apply their delta with sync_warehouse instead.
+
+# warehouse_schema.sql without AUTO_INCREMENT (keys come from the builder),
+# so the same DDL runs on MySQL and on SQLite
+WAREHOUSE_DDL = {
+    'dim_date': """
+        CREATE TABLE dim_date (
+            date_key INT PRIMARY KEY,
+            full_date DATE NOT NULL,
+            day_of_week VARCHAR(10),
+            day_of_month INT,
+            month INT,
+            month_name VARCHAR(10),
+            quarter VARCHAR(2),
+            year INT,
+            is_weekend BOOLEAN
+        )""",
+    'dim_product': """
+        CREATE TABLE dim_product (
+            product_key INT PRIMARY KEY,
+            product_id VARCHAR(20),
+            product_name VARCHAR(100),
+            category VARCHAR(50),
+            subcategory VARCHAR(50),
+            unit_price DECIMAL(10,2)
+        )""",
+    'dim_customer': """
+        CREATE TABLE dim_customer (
+            customer_key INT PRIMARY KEY,
+            customer_id VARCHAR(20),
+            customer_name VARCHAR(100),
+            city VARCHAR(50),
+            state VARCHAR(50),
+            customer_segment VARCHAR(20)
+        )""",
+    'fact_sales': """
+        CREATE TABLE fact_sales (
+            sale_key BIGINT PRIMARY KEY,
+            date_key INT NOT NULL,
+            product_key INT NOT NULL,
+            customer_key INT NOT NULL,
+            quantity_sold INT NOT NULL,
+            unit_price DECIMAL(10,2) NOT NULL,
+            discount_amount DECIMAL(10,2) DEFAULT 0,
+            total_amount DECIMAL(10,2) NOT NULL,
+            FOREIGN KEY (date_key) REFERENCES dim_date(date_key),
+            FOREIGN KEY (product_key) REFERENCES dim_product(product_key),
+            FOREIGN KEY (customer_key) REFERENCES dim_customer(customer_key)
+        )""",
+    **ROLLUP_DDL,
+}
+
+WAREHOUSE_PARENTS = {
+    'fact_sales': ['dim_date', 'dim_product', 'dim_customer'],
+}
+
+# Fact indexes lead with date_key and carry the measures, so month-range
+# aggregations (refresh_rollups, drill-downs on fact_sales) read only the
+# index; product_key/customer_key keep a plain index for their foreign keys
+WAREHOUSE_INDEXES = {
+    'fact_sales': [
+        ('idx_fact_sales_date_product', ['date_key', 'product_key', 'quantity_sold', 'total_amount']),
+        ('idx_fact_sales_date_customer', ['date_key', 'customer_key', 'quantity_sold', 'total_amount']),
+        ('idx_fact_sales_product_key', ['product_key']),
+        ('idx_fact_sales_customer_key', ['customer_key']),
+    ],
+    **ROLLUP_INDEXES,
+}
+
+# Natural keys in the warehouse keep the source system's format ('C001', 'P001')
+ID_PREFIXES = {'customer': 'C', 'product': 'P'}
+ID_DIGITS = 3
+
+
+def natural_ids(prefix, ids):
+    """Source-format IDs ('C001') from the integer IDs of the cleaned tables"""
+    return prefix + ids.astype(np.int64).astype(str).str.zfill(ID_DIGITS)
+
+
+def date_keys(dates):
+    """YYYYMMDD integer key per date ('YYYY-MM-DD' strings or datetimes), 0 for missing dates
+
+    Dates are parsed once per distinct value (the categories), not once per row.
+    """
+    dates = pd.Series(dates).astype('category')
+    days = pd.DatetimeIndex(pd.to_datetime(dates.cat.categories, format='%Y-%m-%d'))
+    keys = (days.year * 10000 + days.month * 100 + days.day).to_numpy(dtype=np.int32)
+    codes = dates.cat.codes.to_numpy()
+    return np.where(codes >= 0, keys[codes], 0).astype(np.int32)
+
+
+def surrogate_keys(dimension_ids, dimension_keys, ids):
+    """Surrogate key for each natural ID in ids, 0 where the dimension has no such ID
+
+    The dimension's IDs become a direct-address array when they are dense
+    (see integrity.DENSE_KEY_RATIO), a sorted array searched with
+    np.searchsorted otherwise.
+    """
+    dimension_ids = np.asarray(dimension_ids, dtype=np.int64)
+    dimension_keys = np.asarray(dimension_keys, dtype=np.int32)
+    ids = pd.Series(ids).to_numpy(dtype=np.int64, na_value=-1)
+    resolved = np.zeros(len(ids), dtype=np.int32)
+    if len(dimension_ids) == 0:
+        return resolved
+
+    largest = dimension_ids.max()
+    if dimension_ids.min() >= 0 and largest <= DENSE_KEY_RATIO * len(dimension_ids):
+        lookup = np.zeros(largest + 1, dtype=np.int32)
+        lookup[dimension_ids] = dimension_keys
+        in_range = (ids >= 0) & (ids <= largest)
+        resolved[in_range] = lookup[ids[in_range]]
+        return resolved
+
+    order = np.argsort(dimension_ids, kind='stable')
+    sorted_ids = dimension_ids[order]
+    positions = np.searchsorted(sorted_ids, ids).clip(max=len(sorted_ids) - 1)
+    found = sorted_ids[positions] == ids
+    resolved[found] = dimension_keys[order][positions[found]]
+    return resolved
+
+
+def build_dim_date(dates):
+    """One row per day from January 1st of the first year to December 31st of the last year in dates"""
+    keys = date_keys(dates)
+    keys = keys[keys > 0]
+    if len(keys) == 0:
+        days = pd.DatetimeIndex([])
+    else:
+        days = pd.date_range(f'{keys.min() // 10000}-01-01', f'{keys.max() // 10000}-12-31', freq='D')
+
+    return pd.DataFrame({
+        'date_key': (days.year * 10000 + days.month * 100 + days.day).to_numpy(dtype=np.int32),
+        'full_date': days.strftime('%Y-%m-%d'),
+        'day_of_week': days.day_name(),
+        'day_of_month': days.day.to_numpy(dtype=np.int8),
+        'month': days.month.to_numpy(dtype=np.int8),
+        'month_name': days.month_name(),
+        'quarter': 'Q' + days.quarter.astype(str),
+        'year': days.year.to_numpy(dtype=np.int16),
+        # 0/1 rather than bool so LOAD DATA writes it the same as the other strategies
+        'is_weekend': (days.dayofweek >= 5).astype(np.int8),
+    })
+
+
+def build_dim_product(products):
+    """dim_product from the cleaned products table; subcategory is not in the source and stays NULL"""
+    products = products.sort_values('product_id')
+    return pd.DataFrame({
+        'product_key': np.arange(1, len(products) + 1, dtype=np.int32),
+        'product_id': natural_ids(ID_PREFIXES['product'], products['product_id']).to_numpy(),
+        'product_name': products['product_name'].to_numpy(),
+        'category': products['category'].to_numpy(),
+        'subcategory': None,
+        'unit_price': products['price'].to_numpy(),
+    })
+
+
+def build_dim_customer(customers):
+    """dim_customer from the cleaned customers table
+
+    state comes from cities.CITY_STATES (NULL for other cities); customer_segment
+    is not in the source and stays NULL.
+    """
+    customers = customers.sort_values('customer_id')
+    names = customers['first_name'].str.cat(customers['last_name'], sep=' ', na_rep='').str.strip()
+    city = customers['city'].astype('category')
+    return pd.DataFrame({
+        'customer_key': np.arange(1, len(customers) + 1, dtype=np.int32),
+        'customer_id': natural_ids(ID_PREFIXES['customer'], customers['customer_id']).to_numpy(),
+        'customer_name': names.replace('', None).to_numpy(),
+        'city': city.to_numpy(),
+        # Mapped once per distinct city
+        'state': city.map(CITY_STATES).astype(object).to_numpy(),
+        'customer_segment': None,
+    })
+
+
+def build_fact_sales(orders, order_items, customer_keys, product_keys, first_sale_key=1):
+    """fact_sales (one row per order item) and the number of items that could not be resolved
+
+    customer_keys / product_keys are (integer natural IDs, surrogate keys)
+    array pairs. Items are merged with their orders once for the customer and
+    date, then every natural ID is swapped for its surrogate key. Items whose
+    quantity or price is missing, or whose keys don't resolve, are left out.
+    """
+    facts = order_items[['order_id', 'product_id', 'quantity', 'unit_price', 'subtotal']].merge(
+        orders[['order_id', 'customer_id', 'order_date']], on='order_id', how='inner', sort=False)
+
+    fact_sales = pd.DataFrame({
+        'date_key': date_keys(facts['order_date']),
+        'product_key': surrogate_keys(*product_keys, facts['product_id']),
+        'customer_key': surrogate_keys(*customer_keys, facts['customer_id']),
+        'quantity_sold': facts['quantity'].to_numpy(),
+        'unit_price': facts['unit_price'].to_numpy(),
+        # No discounts in the source: discount_amount is left to its DEFAULT 0
+        'total_amount': facts['subtotal'].to_numpy(),
+    })
+
+    complete = ((fact_sales[['date_key', 'product_key', 'customer_key']] > 0).all(axis=1)
+                & fact_sales[['quantity_sold', 'unit_price', 'total_amount']].notna().all(axis=1))
+    skipped = len(order_items) - int(complete.sum())
+    fact_sales = fact_sales[complete.to_numpy()]
+    fact_sales.insert(0, 'sale_key', np.arange(first_sale_key, first_sale_key + len(fact_sales), dtype=np.int64))
+    fact_sales['quantity_sold'] = fact_sales['quantity_sold'].astype(np.int32)
+    return fact_sales.reset_index(drop=True), skipped
+
+
+def build_star_schema(customers, products, orders, order_items):
+    """Build {table: DataFrame} for the warehouse and metrics from the validated ETL output
+
+    Returns (frames, metrics); metrics has the rows per table (rollups
+    included) and 'facts_skipped', the order items that did not make it into
+    fact_sales.
+    """
+    customers = customers.sort_values('customer_id')
+    products = products.sort_values('product_id')
+    dim_customer = build_dim_customer(customers)
+    dim_product = build_dim_product(products)
+    frames = {
+        'dim_date': build_dim_date(orders['order_date']),
+        'dim_product': dim_product,
+        'dim_customer': dim_customer,
+    }
+    # Both dimensions are in natural ID order, so their keys line up with the sorted IDs
+    frames['fact_sales'], skipped = build_fact_sales(
+        orders, order_items,
+        (customers['customer_id'].to_numpy(), dim_customer['customer_key'].to_numpy()),
+        (products['product_id'].to_numpy(), dim_product['product_key'].to_numpy()))
+    frames.update(build_rollups(frames['fact_sales']))
+
+    metrics = {table: len(df) for table, df in frames.items()}
+    metrics['facts_skipped'] = skipped
+    return frames, metrics
+
+
+def partitioned_fact_ddl(years):
+    """MySQL DDL of fact_sales range-partitioned by date_key, one partition per year plus one for later dates
+
+    MySQL doesn't allow foreign keys on partitioned tables and every unique
+    key must contain the partitioning column, so the primary key becomes
+    (sale_key, date_key) and the foreign keys are left out (the builder only
+    emits facts whose keys resolved).
+    """
+    partitions = [f"PARTITION p{year} VALUES LESS THAN ({(year + 1) * 10000})" for year in sorted(years)]
+    partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    return """
+        CREATE TABLE fact_sales (
+            sale_key BIGINT NOT NULL,
+            date_key INT NOT NULL,
+            product_key INT NOT NULL,
+            customer_key INT NOT NULL,
+            quantity_sold INT NOT NULL,
+            unit_price DECIMAL(10,2) NOT NULL,
+            discount_amount DECIMAL(10,2) DEFAULT 0,
+            total_amount DECIMAL(10,2) NOT NULL,
+            PRIMARY KEY (sale_key, date_key)
+        )
+        PARTITION BY RANGE (date_key) (
+            """ + ',\n            '.join(partitions) + """
+        )"""
+
+
+def load_warehouse(engine, frames, strategy='executemany', batch_size=DEFAULT_BATCH_SIZE, serial=False, records=None,
+                   partition_facts=False, indexes=WAREHOUSE_INDEXES):
+    """Recreate and bulk load the warehouse tables (dimensions before fact_sales) and rollups
+
+    partition_facts range-partitions fact_sales by date_key, one partition
+    per year of facts (MySQL only; other databases have no table
+    partitioning and ignore it). Secondary indexes are built after the load.
+
+    Returns the number of rows loaded per table.
+    """
+    ddl = WAREHOUSE_DDL
+    if partition_facts and engine.dialect.name == 'mysql':
+        years = np.unique(frames['fact_sales']['date_key'].to_numpy() // 10000)
+        ddl = dict(WAREHOUSE_DDL, fact_sales=partitioned_fact_ddl(years))
+    return bulk_load(engine, frames, strategy=strategy, batch_size=batch_size, serial=serial, records=records,
+                     ddl=ddl, parents=WAREHOUSE_PARENTS, indexes=indexes, stage_prefix='warehouse_')
+
+
+def read_dimension_keys(cursor, dimension):
+    """(integer natural IDs, surrogate keys) arrays of a loaded dimension ('customer' or 'product')"""
+    cursor.execute(f"SELECT {dimension}_id, {dimension}_key FROM dim_{dimension}")
+    rows = pd.DataFrame(list(cursor.fetchall()), columns=['natural_id', 'key'], dtype=object)
+    ids = rows['natural_id'].str[len(ID_PREFIXES[dimension]):].astype(np.int64)
+    return ids.to_numpy(), rows['key'].to_numpy(dtype=np.int32)
+
+
+def assign_keys(dimension_ids, dimension_keys, ids):
+    """Surrogate keys for unique natural ids: the dimension's key when it has the ID, new keys past the largest otherwise"""
+    keys = surrogate_keys(dimension_ids, dimension_keys, ids)
+    new = keys == 0
+    keys[new] = dimension_keys.max(initial=0) + 1 + np.arange(new.sum(), dtype=np.int32)
+    return keys
+
+
+DIMENSION_BUILDERS = {
+    'customer': build_dim_customer,
+    'product': build_dim_product,
+}
+
+
+def _sync_dimension(engine, cursor, dimension, df, batch_size):
+    # Upsert new/changed rows keeping the keys of known IDs; returns the updated key arrays and rows sent
+    dimension_ids, dimension_keys = read_dimension_keys(cursor, dimension)
+    if df is None or len(df) == 0:
+        return (dimension_ids, dimension_keys), 0
+
+    rows = DIMENSION_BUILDERS[dimension](df)
+    ids = np.sort(df[f'{dimension}_id'].to_numpy(dtype=np.int64))
+    rows[f'{dimension}_key'] = assign_keys(dimension_ids, dimension_keys, ids)
+    upsert_rows(engine, cursor, f'dim_{dimension}', rows, batch_size, key=f'{dimension}_key')
+    keys = (np.concatenate([dimension_ids, ids]), np.concatenate([dimension_keys, rows[f'{dimension}_key'].to_numpy()]))
+    return keys, len(rows)
+
+
+def sync_warehouse(engine, customers=None, products=None, orders=None, order_items=None, replace_facts=False,
+                   strategy='executemany', batch_size=DEFAULT_BATCH_SIZE):
+    """Apply an incremental ETL delta to a loaded warehouse, in one transaction
+
+    - new or changed customers/products are upserted into their dimension,
+      keeping the surrogate key of IDs already there (one SELECT per
+      dimension reads the existing keys)
+    - dates of the new orders missing from dim_date are added
+    - the new order items are appended to fact_sales (replace_facts=True
+      replaces fact_sales instead, for a rewritten sales file)
+    - only the rollup months whose date_keys were touched are recomputed
+
+    Returns metrics: rows sent per table, 'facts_skipped' and 'months_refreshed'.
+    """
+    metrics = {'facts_skipped': 0, 'months_refreshed': 0}
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        customer_keys, metrics['dim_customer'] = _sync_dimension(engine, cursor, 'customer', customers, batch_size)
+        product_keys, metrics['dim_product'] = _sync_dimension(engine, cursor, 'product', products, batch_size)
+
+        if orders is not None and order_items is not None:
+            cursor.execute("SELECT date_key FROM dim_date")
+            known_dates = np.array([row[0] for row in cursor.fetchall()], dtype=np.int64)
+            dim_date = build_dim_date(orders['order_date'])
+            dim_date = dim_date[~np.isin(dim_date['date_key'], known_dates)]
+            if len(dim_date):
+                LOAD_STRATEGIES[strategy](engine, cursor, 'dim_date', dim_date, batch_size)
+            metrics['dim_date'] = len(dim_date)
+
+            months = set()
+            if replace_facts:
+                # Every month that had facts changes too
+                cursor.execute("SELECT DISTINCT month_key FROM agg_sales_month_product")
+                months.update(row[0] for row in cursor.fetchall())
+                cursor.execute("DELETE FROM fact_sales")
+                first_sale_key = 1
+            else:
+                cursor.execute("SELECT COALESCE(MAX(sale_key), 0) FROM fact_sales")
+                first_sale_key = int(cursor.fetchone()[0]) + 1
+
+            fact_sales, metrics['facts_skipped'] = build_fact_sales(orders, order_items, customer_keys, product_keys,
+                                                                    first_sale_key)
+            if len(fact_sales):
+                LOAD_STRATEGIES[strategy](engine, cursor, 'fact_sales', fact_sales, batch_size)
+            metrics['fact_sales'] = len(fact_sales)
+
+            months.update(month_keys(fact_sales['date_key']))
+            refresh_rollups(cursor, sorted(months))
+            metrics['months_refreshed'] = len(months)
+
+        raw_connection.commit()
+        cursor.close()
+    finally:
+        raw_connection.close()
+
+    return metrics
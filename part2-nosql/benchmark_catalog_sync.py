@@ -0,0 +1,167 @@
+"""Throughput of the bulk catalog sync against one write per product / per review
+
+A catalog of --products products (with a few embedded reviews each) and a
+file of --reviews new reviews are generated, then written into a freshly
+dropped collection two ways: catalog_sync's bulk_write batches, and one
+update_one per product and per review, like operation 4 of
+mongodb_operations.js. Parsing alone is timed too (streamed vs json.load).
+
+The syncs are only timed against a MongoDB server (--mongo-url). Without
+one they run on mongomock, at small default sizes since it scans the
+collection on every lookup, and only the write requests sent and the
+check that both ways leave the same documents behind are reported:
+mongomock's timings say nothing about a server's.
+
+Usage: python benchmark_catalog_sync.py [--products N] [--reviews N] [--batch-size 1000] [--mongo-url URL]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from catalog_sync import (open_collection, create_indexes, iter_json_array, upsert_products, append_reviews,
+                          product_pipeline, reviews_pipeline, DEFAULT_BATCH_SIZE, DEFAULT_MONGO_URL)
+
+CATEGORIES = ['Electronics', 'Fashion', 'Groceries', 'Books', 'Home']
+
+# Default (products, reviews) on a MongoDB server and on mongomock
+SERVER_SIZES = (10_000, 50_000)
+MONGOMOCK_SIZES = (500, 2_500)
+
+
+def write_json_array(path, items):
+    """Write items as a JSON array, one element per line"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        for number, item in enumerate(items):
+            f.write((',\n' if number else '') + json.dumps(item))
+        f.write('\n]\n')
+
+
+def make_review(rng, number):
+    return {'user_id': f'U{number:06d}', 'username': f'user{number}', 'rating': rng.randint(1, 5),
+            'comment': 'Generated review', 'date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'}
+
+
+def make_catalog(products, seed=42):
+    rng = random.Random(seed)
+    for number in range(1, products + 1):
+        yield {
+            'product_id': f'PRD{number:07d}',
+            'name': f'Product {number}',
+            'category': rng.choice(CATEGORIES),
+            'price': round(rng.uniform(99, 99999), 2),
+            'stock': rng.randint(0, 500),
+            'specifications': {'brand': f'Brand{rng.randint(1, 50)}', 'weight_g': rng.randint(50, 5000)},
+            'reviews': [make_review(rng, rng.randint(1, 10**6)) for _ in range(rng.randint(0, 5))],
+            'tags': rng.sample(['new', 'sale', 'popular', 'eco', 'premium'], 2),
+        }
+
+
+def make_reviews(reviews, products, seed=43):
+    rng = random.Random(seed)
+    for number in range(reviews):
+        review = make_review(rng, number)
+        review['product_id'] = f'PRD{rng.randint(1, products):07d}'
+        yield review
+
+
+def one_by_one(collection, catalog_path, reviews_path):
+    """The catalog and reviews written with one update_one each, returns the requests sent"""
+    requests = 0
+    for product in iter_json_array(catalog_path):
+        collection.update_one({'product_id': product['product_id']}, product_pipeline(product), upsert=True)
+        requests += 1
+    for review in iter_json_array(reviews_path):
+        review = dict(review)
+        collection.update_one({'product_id': review.pop('product_id')}, reviews_pipeline([review]))
+        requests += 1
+    return requests
+
+
+def bulk(collection, catalog_path, reviews_path, batch_size):
+    """The catalog and reviews written by catalog_sync, returns the write requests sent"""
+    catalog = upsert_products(collection, iter_json_array(catalog_path), batch_size)
+    reviews = append_reviews(collection, iter_json_array(reviews_path), batch_size)
+    return catalog['batches'] + reviews['batches']
+
+
+def timed(func, *args):
+    """(seconds, result) of func(*args)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def snapshot(collection):
+    return sorted(collection.find({}, {'_id': 0}), key=lambda product: product['product_id'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=None,
+                        help=f"(default: {SERVER_SIZES[0]:,} on a server, {MONGOMOCK_SIZES[0]:,} on mongomock)")
+    parser.add_argument('--reviews', type=int, default=None,
+                        help=f"(default: {SERVER_SIZES[1]:,} on a server, {MONGOMOCK_SIZES[1]:,} on mongomock)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--mongo-url', default=None,
+                        help="MongoDB server to time the syncs on (without one they only run on mongomock, untimed)")
+    parser.add_argument('--database', default='fleximart_benchmark')
+    args = parser.parse_args()
+
+    timed_syncs = args.mongo_url is not None
+    default_products, default_reviews = SERVER_SIZES if timed_syncs else MONGOMOCK_SIZES
+    args.products = args.products or default_products
+    args.reviews = args.reviews or default_reviews
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog_path = os.path.join(tmp, 'catalog.json')
+        reviews_path = os.path.join(tmp, 'reviews.json')
+        write_json_array(catalog_path, make_catalog(args.products))
+        write_json_array(reviews_path, make_reviews(args.reviews, args.products))
+        size_mb = os.path.getsize(catalog_path) / 1024**2
+        print(f"{args.products:,} products ({size_mb:.1f} MB), {args.reviews:,} new reviews, "
+              f"target: {args.mongo_url or 'mongomock'}")
+
+        def load_whole():
+            with open(catalog_path, encoding='utf-8') as f:
+                json.load(f)
+
+        print(f"\n{'step':<34} {'time (s)':>9} {'docs/s':>12} {'requests':>9}")
+        print("-" * 67)
+        for name, (seconds, _) in [('parse catalog (json.load)', timed(load_whole)),
+                                   ('parse catalog (streamed)',
+                                    timed(lambda: sum(1 for _ in iter_json_array(catalog_path))))]:
+            print(f"{name:<34} {seconds:>9.2f} {args.products / seconds:>12,.0f}")
+
+        results = {}
+        for way in ['one by one', 'bulk_write']:
+            collection = open_collection(args.mongo_url or DEFAULT_MONGO_URL, args.database, 'products',
+                                         mock=not timed_syncs)
+            collection.drop()
+            with contextlib.redirect_stdout(io.StringIO()):
+                create_indexes(collection)
+            if way == 'one by one':
+                seconds, requests = timed(one_by_one, collection, catalog_path, reviews_path)
+            else:
+                seconds, requests = timed(bulk, collection, catalog_path, reviews_path, args.batch_size)
+            results[way] = snapshot(collection)
+            collection.drop()
+            writes = args.products + args.reviews
+            if timed_syncs:
+                print(f"{'sync + reviews, ' + way:<34} {seconds:>9.2f} {writes / seconds:>12,.0f} {requests:>9,}")
+            else:
+                print(f"{'sync + reviews, ' + way:<34} {'-':>9} {'-':>12} {requests:>9,}")
+
+        assert results['one by one'] == results['bulk_write'], "bulk and one-by-one syncs disagree"
+        print("\n✓ Both ways left the same documents")
+        if not timed_syncs:
+            print("  (ran on mongomock, so the syncs are not timed; pass --mongo-url to time them on a server)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Products rated 4 or more: $avg over every review (aggregation) against the precomputed avg_rating (index)
+
+--products products with --reviews reviews between them are written the
+way the catalog was before the rating statistics existed (reviews only),
+then the statistics are backfilled with catalog_sync.backfill_rating_stats.
+Operation 3 of mongodb_operations.js is then run both ways, best of
+--repeat:
+
+  aggregation   $project avgRating: {$avg: "$reviews.rating"}, $match >= 4,
+                $sort: every review of every product is read on every query
+  precomputed   find({avg_rating: {$gte: 4}}) sorted on avg_rating: a range
+                scan of idx_products_avg_rating
+
+Both must return the same products with the same averages, also after
+--append more reviews are added with catalog_sync.append_reviews (which
+maintains the statistics). Some reviews carry an explicit null rating,
+which $avg and the statistics must both leave out.
+
+Steps are only timed against a MongoDB server (--mongo-url), which also
+prints the plan of the precomputed query. Without one everything runs on
+mongomock at small default sizes and only the check is reported:
+mongomock's timings say nothing about a server's.
+
+Usage: python benchmark_rating_stats.py [--products N] [--reviews N] [--append N] [--repeat 3] [--mongo-url URL]
+"""
+import argparse
+import collections
+import contextlib
+import io
+import random
+import time
+
+from catalog_sync import (open_collection, create_indexes, batched, backfill_rating_stats, append_reviews,
+                          DEFAULT_BATCH_SIZE, DEFAULT_MONGO_URL)
+
+CATEGORIES = ['Electronics', 'Fashion', 'Groceries', 'Books', 'Home']
+
+# Default (products, reviews, appended reviews) on a MongoDB server and on mongomock
+SERVER_SIZES = (100_000, 1_000_000, 10_000)
+MONGOMOCK_SIZES = (500, 5_000, 500)
+
+# Share of reviews with an explicit null rating
+NULL_RATING_SHARE = 0.02
+
+FIELDS = {'_id': 0, 'product_id': 1, 'name': 1, 'category': 1}
+
+# Operation 3 as mongodb_operations.js ran it before the statistics existed
+# (product_id is only added to get a stable order among equal averages)
+AGGREGATION = [
+    {'$project': {**FIELDS, 'avgRating': {'$avg': '$reviews.rating'}}},
+    {'$match': {'avgRating': {'$gte': 4}}},
+    {'$sort': {'avgRating': -1, 'product_id': 1}},
+]
+
+
+def make_review(rng, quality):
+    """A review whose rating centres on the product's quality (1 to 5), or now and then is null"""
+    rating = max(1, min(5, round(rng.gauss(quality, 1))))
+    return {'user_id': f'U{rng.randint(1, 10**6):07d}', 'rating': None if rng.random() < NULL_RATING_SHARE else rating,
+            'date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'}
+
+
+def make_products(products, reviews, seed=42):
+    """Products with reviews spread at random between them, without rating statistics"""
+    rng = random.Random(seed)
+    counts = collections.Counter(rng.randrange(products) for _ in range(reviews))
+    for number in range(products):
+        quality = rng.uniform(1, 5)
+        yield {
+            'product_id': f'PRD{number + 1:07d}',
+            'name': f'Product {number + 1}',
+            'category': rng.choice(CATEGORIES),
+            'price': round(rng.uniform(99, 99999), 2),
+            'reviews': [make_review(rng, quality) for _ in range(counts[number])],
+        }
+
+
+def make_new_reviews(count, products, seed=43):
+    rng = random.Random(seed)
+    for _ in range(count):
+        review = make_review(rng, rng.uniform(1, 5))
+        review['product_id'] = f'PRD{rng.randint(1, products):07d}'
+        yield review
+
+
+def load_legacy(collection, products, batch_size):
+    """Write the products as plain documents (no statistics), like a catalog synced before they existed"""
+    from pymongo import UpdateOne
+
+    for batch in batched(products, batch_size):
+        collection.bulk_write([UpdateOne({'product_id': product['product_id']}, {'$set': product}, upsert=True)
+                               for product in batch], ordered=False)
+
+
+def by_aggregation(collection):
+    return [(doc['product_id'], doc['avgRating']) for doc in collection.aggregate(AGGREGATION)]
+
+
+def by_precomputed(collection):
+    found = collection.find({'avg_rating': {'$gte': 4}}, {**FIELDS, 'avg_rating': 1},
+                            sort=[('avg_rating', -1), ('product_id', 1)])
+    return [(doc['product_id'], doc['avg_rating']) for doc in found]
+
+
+def best_of(repeat, func, *args):
+    """(fastest seconds, result) of repeat calls"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def same_results(a, b):
+    return len(a) == len(b) and all(id_a == id_b and abs(avg_a - avg_b) < 1e-9 for (id_a, avg_a), (id_b, avg_b) in zip(a, b))
+
+
+def step(name, seconds, timed):
+    """One line of the step table (the time only when timed)"""
+    print(f"{name:<44} " + (f"{seconds:>9.3f}" if timed else f"{'-':>9}"))
+
+
+def compare_queries(collection, repeat, label, timed):
+    """Time both forms of operation 3 and check they agree, returns the number of products found"""
+    aggregation_s, expected = best_of(repeat, by_aggregation, collection)
+    precomputed_s, found = best_of(repeat, by_precomputed, collection)
+    if not same_results(expected, found):
+        raise AssertionError(f"{label}: the precomputed avg_rating disagrees with $avg over the reviews")
+    step('operation 3, aggregation (' + label + ')', aggregation_s, timed)
+    step('operation 3, precomputed (' + label + ')', precomputed_s, timed)
+    speedup = f"{aggregation_s / precomputed_s:,.0f}x faster, " if timed else ""
+    print(f"{'':<44} {'':>9}   {speedup}{len(found):,} products")
+    return len(found)
+
+
+def winning_plan(collection):
+    """Stages of the server's winning plan for the precomputed query, outermost first"""
+    plan = collection.find({'avg_rating': {'$gte': 4}}).sort('avg_rating', -1).explain()['queryPlanner']['winningPlan']
+    stages = []
+    while plan:
+        stages.append(plan['stage'] + (f" {plan['indexName']}" if 'indexName' in plan else ''))
+        plan = plan.get('inputStage')
+    return ' <- '.join(stages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=None,
+                        help=f"(default: {SERVER_SIZES[0]:,} on a server, {MONGOMOCK_SIZES[0]:,} on mongomock)")
+    parser.add_argument('--reviews', type=int, default=None,
+                        help=f"(default: {SERVER_SIZES[1]:,} on a server, {MONGOMOCK_SIZES[1]:,} on mongomock)")
+    parser.add_argument('--append', type=int, default=None,
+                        help=f"reviews appended after the backfill (default: {SERVER_SIZES[2]:,} on a server, "
+                             f"{MONGOMOCK_SIZES[2]:,} on mongomock)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--mongo-url', default=None,
+                        help="MongoDB server to time the steps on (without one they only run on mongomock, untimed)")
+    parser.add_argument('--database', default='fleximart_benchmark')
+    args = parser.parse_args()
+
+    timed = args.mongo_url is not None
+    sizes = SERVER_SIZES if timed else MONGOMOCK_SIZES
+    args.products = args.products if args.products is not None else sizes[0]
+    args.reviews = args.reviews if args.reviews is not None else sizes[1]
+    args.append = args.append if args.append is not None else sizes[2]
+
+    collection = open_collection(args.mongo_url or DEFAULT_MONGO_URL, args.database, 'products',
+                                 mock=not timed)
+    collection.drop()
+    print(f"{args.products:,} products, {args.reviews:,} reviews, target: {args.mongo_url or 'mongomock'}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_indexes(collection)
+    start = time.perf_counter()
+    load_legacy(collection, make_products(args.products, args.reviews), args.batch_size)
+    print(f"\n{'step':<44} {'time (s)':>9}")
+    print("-" * 54)
+    step('generate + load (no statistics)', time.perf_counter() - start, timed)
+
+    start = time.perf_counter()
+    backfilled = backfill_rating_stats(collection)
+    step(f'backfill of {backfilled:,} products', time.perf_counter() - start, timed)
+
+    compare_queries(collection, args.repeat, 'backfilled', timed)
+
+    if args.append:
+        start = time.perf_counter()
+        append_reviews(collection, make_new_reviews(args.append, args.products), args.batch_size)
+        step(f'append {args.append:,} reviews with statistics', time.perf_counter() - start, timed)
+        compare_queries(collection, args.repeat, 'appended', timed)
+
+    if timed:
+        print(f"\nPlan of the precomputed query: {winning_plan(collection)}")
+    collection.drop()
+    print("\n✓ The precomputed avg_rating matched $avg over the reviews")
+    if not timed:
+        print("  (ran on mongomock, so the steps are not timed; pass --mongo-url to time them on a server)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Sync products_catalog.json into the MongoDB products collection with bulk upserts
+
+The catalog file is streamed one product at a time (see iter_json_array)
+and written with bulk_write in batches of --batch-size products: one upsert
+per product keyed on product_id, replacing the product's fields and adding
+its reviews to the embedded array. Running the sync again with the same file
+changes nothing. A separate reviews file (a JSON array of reviews, each with
+its product_id) is appended in batches too, one update per product per batch
+instead of one updateOne per review.
+
+Every product also carries rating_sum, rating_count and avg_rating, the
+statistics of its review ratings, so that "average rating >= 4" is a range
+scan of idx_products_avg_rating rather than an $avg over every review of
+every product. They are maintained by the same (pipeline) update that adds
+reviews, so a product's reviews and statistics never disagree.
+--backfill-ratings computes them for documents written before they existed.
+
+--mongomock runs everything in-process on mongomock instead of on a
+MongoDB server, to try it out or check results (mongomock 4.x needs
+pymongo < 4.9). The write operations are pymongo's either way.
+
+Usage: python catalog_sync.py [--catalog products_catalog.json] [--reviews new_reviews.json]
+                              [--mongo-url mongodb://localhost:27017] [--mongomock]
+                              [--backfill-ratings]
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+# MongoDB catalog sync: streaming JSON reader, bulk upserts and review
+# appends that maintain the rating statistics, and the indexes the queries
+# of mongodb_operations.js rely on.
+#
+# pymongo (and mongomock) are only imported when a collection is opened or
+# written, so the JSON reader works without them.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CATALOG = os.path.join(HERE, 'products_catalog.json')
+DEFAULT_MONGO_URL = 'mongodb://localhost:27017'
+DEFAULT_DATABASE = 'fleximart_nosql'
+DEFAULT_COLLECTION = 'products'
+DEFAULT_BATCH_SIZE = 1000
+
+# Characters read from the catalog file at a time
+READ_SIZE = 1 << 16
+
+WHITESPACE = re.compile(r'\s*')
+SEPARATORS = re.compile(r'[\s,]*')
+NON_WHITESPACE = re.compile(r'\S')
+
+# (name, keys, options) of the products indexes:
+#   product_id      the upsert key, so each upsert is an index lookup
+#   category+price  operation 2 (category = ... AND price < ...), and the
+#                   category grouping of operation 5
+#   reviews.rating  filters on individual review ratings (multikey)
+#   avg_rating      operation 3 (products rated 4 or more, best first)
+CATALOG_INDEXES = [
+    ('idx_products_product_id', [('product_id', 1)], {'unique': True}),
+    ('idx_products_category_price', [('category', 1), ('price', 1)], {}),
+    ('idx_products_review_rating', [('reviews.rating', 1)], {}),
+    ('idx_products_avg_rating', [('avg_rating', 1)], {}),
+]
+
+# Update pipeline stage deriving avg_rating from rating_sum / rating_count
+# (null while a product has no rated review)
+AVG_RATING_STAGE = {'$set': {'avg_rating': {'$cond': [{'$gt': ['$rating_count', 0]},
+                                                      {'$divide': ['$rating_sum', '$rating_count']}, None]}}}
+
+# The product's review ratings, without explicit null ones: $sum skips those,
+# $size would count them (reviews_pipeline skips them too)
+RATINGS = {'$filter': {'input': {'$ifNull': ['$reviews.rating', []]}, 'as': 'rating',
+                       'cond': {'$ne': ['$$rating', None]}}}
+
+# Update pipeline stage recomputing the rating statistics from the whole reviews array
+RATING_STATS_STAGE = {'$set': {'rating_sum': {'$sum': '$reviews.rating'}, 'rating_count': {'$size': RATINGS}}}
+
+
+def iter_json_array(path, read_size=READ_SIZE):
+    """Yield the elements of the top-level JSON array in path one at a time
+
+    Only the element being decoded (plus one read) is held in memory, so the
+    file can be far larger than what json.load could handle.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buffer, position, eof, started = '', 0, False, False
+
+        while True:
+            # Skip whitespace, and the commas between elements
+            position = (SEPARATORS if started else WHITESPACE).match(buffer, position).end()
+
+            element, end = None, None
+            if position < len(buffer):
+                if not started:
+                    if buffer[position] != '[':
+                        raise ValueError(f"{path} does not hold a JSON array")
+                    started, position = True, position + 1
+                    continue
+                if buffer[position] == ']':
+                    return
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    pass
+
+            # A value is complete once the ',' or ']' after it is in the buffer: until then
+            # it may be cut off, like '4.' of '4.5' (which raw_decode reads as 4)
+            following = NON_WHITESPACE.search(buffer, end) if end is not None else None
+            if following is None or following.group() not in ',]':
+                if eof:
+                    raise ValueError(f"{path} is not a complete JSON array")
+                data = f.read(read_size)
+                eof = not data
+                buffer, position = buffer[position:] + data, 0
+                continue
+
+            yield element
+            position = end
+
+
+def batched(items, size):
+    """Lists of up to size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def open_collection(mongo_url=DEFAULT_MONGO_URL, database=DEFAULT_DATABASE, collection=DEFAULT_COLLECTION,
+                    mock=False):
+    """The products collection on a MongoDB server, or on mongomock (a new, empty one)"""
+    if mock:
+        try:
+            import mongomock
+        except ImportError:
+            raise ImportError("The mongomock stand-in needs mongomock (pip install mongomock)")
+        client = mongomock.MongoClient()
+    else:
+        try:
+            from pymongo import MongoClient
+        except ImportError:
+            raise ImportError("The catalog sync needs pymongo (pip install pymongo)")
+        client = MongoClient(mongo_url)
+    return client[database][collection]
+
+
+def create_indexes(collection, indexes=CATALOG_INDEXES):
+    """Create the catalog indexes that don't exist yet"""
+    existing = collection.index_information()
+    for name, keys, options in indexes:
+        if name not in existing:
+            collection.create_index(keys, name=name, **options)
+    print(f"✓ Indexes: {', '.join(name for name, _, _ in indexes)}")
+
+
+def product_pipeline(product):
+    """Update pipeline that inserts or refreshes one catalog product
+
+    All fields but the reviews are overwritten; reviews are added to the
+    embedded array (created empty if need be) unless an identical review is
+    already there, and the rating statistics recomputed.
+    """
+    fields = {key: {'$literal': value} for key, value in product.items() if key not in ('_id', 'reviews')}
+    current = {'$ifNull': ['$reviews', []]}
+    new_reviews = {'$filter': {'input': {'$literal': product.get('reviews') or []}, 'as': 'review',
+                               'cond': {'$eq': [{'$in': ['$$review', current]}, False]}}}
+    return [{'$set': {**fields, 'reviews': {'$concatArrays': [current, new_reviews]}}},
+            RATING_STATS_STAGE,
+            AVG_RATING_STAGE]
+
+
+def product_upsert(product):
+    """UpdateOne that upserts one catalog product (see product_pipeline)"""
+    from pymongo import UpdateOne
+
+    return UpdateOne({'product_id': product['product_id']}, product_pipeline(product), upsert=True)
+
+
+def upsert_products(collection, products, batch_size=DEFAULT_BATCH_SIZE):
+    """bulk_write the products (any iterable of dicts) in batches, returns metrics"""
+    metrics = dict.fromkeys(['products', 'inserted', 'updated', 'reviews', 'batches'], 0)
+    for batch in batched(products, batch_size):
+        result = collection.bulk_write([product_upsert(product) for product in batch], ordered=False)
+        metrics['products'] += len(batch)
+        metrics['inserted'] += result.upserted_count
+        metrics['updated'] += result.modified_count
+        metrics['reviews'] += sum(len(product.get('reviews') or []) for product in batch)
+        metrics['batches'] += 1
+    return metrics
+
+
+def reviews_pipeline(reviews):
+    """Update pipeline that appends reviews to a product and adds their ratings to its statistics
+
+    Statistics missing on the product (not backfilled yet) are computed from
+    its current reviews first.
+    """
+    ratings = [review['rating'] for review in reviews if review.get('rating') is not None]
+    return [
+        {'$set': {
+            'reviews': {'$concatArrays': [{'$ifNull': ['$reviews', []]}, {'$literal': reviews}]},
+            'rating_sum': {'$add': [{'$ifNull': ['$rating_sum', RATING_STATS_STAGE['$set']['rating_sum']]},
+                                    sum(ratings)]},
+            'rating_count': {'$add': [{'$ifNull': ['$rating_count', RATING_STATS_STAGE['$set']['rating_count']]},
+                                      len(ratings)]},
+        }},
+        AVG_RATING_STAGE,
+    ]
+
+
+def reviews_push(product_id, reviews):
+    """UpdateOne appending reviews to one product (see reviews_pipeline)"""
+    from pymongo import UpdateOne
+
+    return UpdateOne({'product_id': product_id}, reviews_pipeline(reviews))
+
+
+def append_reviews(collection, reviews, batch_size=DEFAULT_BATCH_SIZE):
+    """Append reviews (dicts with a product_id) to their products, one update per product per batch
+
+    Reviews of one product keep their order. Reviews of products that
+    aren't in the collection are counted as 'unmatched' and dropped.
+    """
+    metrics = dict.fromkeys(['reviews', 'products', 'unmatched', 'batches'], 0)
+    for batch in batched(reviews, batch_size):
+        per_product = {}
+        for review in batch:
+            review = dict(review)
+            per_product.setdefault(review.pop('product_id'), []).append(review)
+
+        operations = [reviews_push(product_id, product_reviews) for product_id, product_reviews in per_product.items()]
+        result = collection.bulk_write(operations, ordered=False)
+        metrics['reviews'] += len(batch)
+        metrics['products'] += result.matched_count
+        if result.matched_count < len(per_product):
+            metrics['unmatched'] += _unmatched_reviews(collection, per_product)
+        metrics['batches'] += 1
+    return metrics
+
+
+def backfill_rating_stats(collection):
+    """Compute the rating statistics of every product that has none yet, on the server in one update_many
+
+    Returns the number of products updated.
+    """
+    result = collection.update_many({'rating_count': {'$exists': False}}, [RATING_STATS_STAGE, AVG_RATING_STAGE])
+    return result.modified_count
+
+
+def _unmatched_reviews(collection, per_product):
+    """Reviews of the batch whose product isn't in the collection"""
+    found = {doc['product_id'] for doc in collection.find({'product_id': {'$in': list(per_product)}}, {'product_id': 1})}
+    return sum(len(product_reviews) for product_id, product_reviews in per_product.items() if product_id not in found)
+
+
+def sync_catalog(collection, catalog_path=DEFAULT_CATALOG, reviews_path=None, batch_size=DEFAULT_BATCH_SIZE,
+                 backfill_ratings=False):
+    """Create the indexes, (backfill the rating statistics,) upsert the catalog file and append the reviews file
+
+    Returns metrics.
+    """
+    create_indexes(collection)
+
+    if backfill_ratings:
+        start = time.perf_counter()
+        backfilled = backfill_rating_stats(collection)
+        print(f"✓ Backfilled the rating statistics of {backfilled} products, {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    metrics = {'catalog': upsert_products(collection, iter_json_array(catalog_path), batch_size)}
+    metrics['catalog']['seconds'] = time.perf_counter() - start
+    catalog = metrics['catalog']
+    print(f"✓ Synced {catalog['products']} products ({catalog['inserted']} new, {catalog['updated']} changed) "
+          f"in {catalog['batches']} batches, {catalog['seconds']:.2f}s")
+
+    if reviews_path:
+        start = time.perf_counter()
+        metrics['reviews'] = append_reviews(collection, iter_json_array(reviews_path), batch_size)
+        metrics['reviews']['seconds'] = time.perf_counter() - start
+        reviews = metrics['reviews']
+        print(f"✓ Appended {reviews['reviews'] - reviews['unmatched']} reviews to {reviews['products']} products "
+              f"({reviews['unmatched']} for unknown products dropped), {reviews['seconds']:.2f}s")
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG, help="JSON array of products (default: products_catalog.json)")
+    parser.add_argument('--reviews', default=None, help="JSON array of new reviews, each with its product_id")
+    parser.add_argument('--mongo-url', default=DEFAULT_MONGO_URL)
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--collection', default=DEFAULT_COLLECTION)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"products / reviews per bulk_write (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--mongomock', action='store_true',
+                        help="sync into an in-process mongomock collection instead of the server (to try it out)")
+    parser.add_argument('--backfill-ratings', action='store_true',
+                        help="first compute rating_sum / rating_count / avg_rating of products that lack them")
+    args = parser.parse_args()
+
+    collection = open_collection(args.mongo_url, args.database, args.collection, mock=args.mongomock)
+    sync_catalog(collection, args.catalog, args.reviews, args.batch_size, args.backfill_ratings)
+    print(f"✓ {collection.count_documents({})} products in {args.database}.{args.collection}")
+
+
+if __name__ == "__main__":
+    main()
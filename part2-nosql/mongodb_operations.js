@@ -6,6 +6,38 @@
 use fleximart_nosql
 db.products.countDocuments()
 
+// Indexes for operations 2, 3 and 5 (catalog_sync.py creates the same ones)
+db.products.createIndex({ product_id: 1 }, { unique: true, name: "idx_products_product_id" })
+db.products.createIndex({ category: 1, price: 1 }, { name: "idx_products_category_price" })
+db.products.createIndex({ "reviews.rating": 1 }, { name: "idx_products_review_rating" })
+db.products.createIndex({ avg_rating: 1 }, { name: "idx_products_avg_rating" })
+
+// Rating statistics of products loaded without them (catalog_sync.py --backfill-ratings),
+// kept up to date by every review update afterwards (see operation 4)
+db.products.updateMany(
+  { rating_count: { $exists: false } },
+  [
+    {
+      $set: {
+        rating_sum: { $sum: "$reviews.rating" },
+        // explicit null ratings are left out, as $sum leaves them out
+        rating_count: {
+          $size: {
+            $filter: { input: { $ifNull: ["$reviews.rating", []] }, as: "rating", cond: { $ne: ["$$rating", null] } }
+          }
+        }
+      }
+    },
+    {
+      $set: {
+        avg_rating: {
+          $cond: [{ $gt: ["$rating_count", 0] }, { $divide: ["$rating_sum", "$rating_count"] }, null]
+        }
+      }
+    }
+  ]
+)
+
 // OPERATION 2: BASIC QUERY (2 marks)
 
 db.products.find(
@@ -23,46 +55,66 @@ db.products.find(
 
 // OPERATION 3: REVIEW ANALYSIS (2 marks)
 
-db.products.aggregate([
-  {
-    $project: {
-      product_id: 1,
-      name: 1,
-      category: 1,
-      price: 1,
-      // Calculate average rating from reviews array
-      avgRating: { $avg: "$reviews.rating" }
-    }
-  },
+// avg_rating is precomputed, so this is a range scan of idx_products_avg_rating
+// instead of an $avg over every product's reviews
+db.products.find(
   {
-    $match: {
-      avgRating: { $gte: 4.0 }
-    }
+    avg_rating: { $gte: 4.0 }
   },
   {
-    $sort: { avgRating: -1 }
+    product_id: 1,
+    name: 1,
+    category: 1,
+    price: 1,
+    avgRating: "$avg_rating"
   }
-])
+).sort({ avg_rating: -1 })
 
 // OPERATION 4: UPDATE OPERATION (2 marks)
 
+// One pipeline update: the review and the rating statistics change together
 db.products.updateOne(
   { product_id: "ELEC001" },
-  {
-    $push: {
-      reviews: {
-        user: "U999",
-        rating: 4,
-        comment: "Good value",
-        date: new Date("2024-07-01")
+  [
+    {
+      $set: {
+        reviews: {
+          $concatArrays: [
+            { $ifNull: ["$reviews", []] },
+            [{ user: "U999", rating: 4, comment: "Good value", date: new Date("2024-07-01") }]
+          ]
+        },
+        rating_sum: { $add: [{ $ifNull: ["$rating_sum", { $sum: "$reviews.rating" }] }, 4] },
+        rating_count: {
+          $add: [
+            {
+              $ifNull: [
+                "$rating_count",
+                {
+                  $size: {
+                    $filter: { input: { $ifNull: ["$reviews.rating", []] }, as: "rating", cond: { $ne: ["$$rating", null] } }
+                  }
+                }
+              ]
+            },
+            1
+          ]
+        }
+      }
+    },
+    {
+      $set: {
+        avg_rating: {
+          $cond: [{ $gt: ["$rating_count", 0] }, { $divide: ["$rating_sum", "$rating_count"] }, null]
+        }
       }
     }
-  }
+  ]
 )
 
 db.products.findOne(
   { product_id: "ELEC001" },
-  { name: 1, reviews: 1 }
+  { name: 1, reviews: 1, avg_rating: 1 }
 )
 
 // OPERATION 5: COMPLEX AGGREGATION 
@@ -1,4 +1,9 @@
 -- FLEXIMART DATA WAREHOUSE - ANALYTICAL QUERIES
+-- All three queries read the month x product / month x customer rollups
+-- (agg_sales_month_product, agg_sales_month_customer) instead of scanning
+-- fact_sales, so their cost follows months x products/customers rather
+-- than the number of sales. month_key is YYYYMM; the first day of the
+-- month in dim_date is month_key * 100 + 1.
 USE fleximart_dw;
 
 -- =====================================================
@@ -13,14 +18,14 @@ SELECT
     d.year,
     d.quarter,
     d.month_name,
-    SUM(f.total_amount) AS total_sales,
-    SUM(f.quantity_sold) AS total_quantity
+    SUM(r.total_amount) AS total_sales,
+    SUM(r.quantity_sold) AS total_quantity
 FROM 
-    fact_sales f
+    agg_sales_month_product r
 INNER JOIN 
-    dim_date d ON f.date_key = d.date_key
+    dim_date d ON d.date_key = r.month_key * 100 + 1
 WHERE 
-    d.year = 2024
+    r.month_key BETWEEN 202401 AND 202412
 GROUP BY 
     d.year, d.quarter, d.month, d.month_name
 ORDER BY 
@@ -39,19 +44,19 @@ ORDER BY
 SELECT 
     p.product_name,
     p.category,
-    SUM(f.quantity_sold) AS units_sold,
-    SUM(f.total_amount) AS revenue,
+    SUM(r.quantity_sold) AS units_sold,
+    SUM(r.total_amount) AS revenue,
     CONCAT(
         ROUND(
-            (SUM(f.total_amount) * 100.0 / SUM(SUM(f.total_amount)) OVER ()), 
+            (SUM(r.total_amount) * 100.0 / SUM(SUM(r.total_amount)) OVER ()), 
             2
         ), 
         '%'
     ) AS revenue_percentage
 FROM 
-    fact_sales f
+    agg_sales_month_product r
 INNER JOIN 
-    dim_product p ON f.product_key = p.product_key
+    dim_product p ON r.product_key = p.product_key
 GROUP BY 
     p.product_key, p.product_name, p.category
 ORDER BY 
@@ -68,17 +73,17 @@ LIMIT 10;
 
 -- Method 1: Using CTE (Common Table Expression) - Recommended
 WITH customer_spending AS (
-    -- Calculate total spending per customer
+    -- Calculate total spending per customer (from the monthly rollup)
     SELECT 
         c.customer_key,
         c.customer_name,
         c.city,
         c.customer_segment AS original_segment,
-        SUM(f.total_amount) AS total_spent
+        SUM(r.total_amount) AS total_spent
     FROM 
-        fact_sales f
+        agg_sales_month_customer r
     INNER JOIN 
-        dim_customer c ON f.customer_key = c.customer_key
+        dim_customer c ON r.customer_key = c.customer_key
     GROUP BY 
         c.customer_key, c.customer_name, c.city, c.customer_segment
 ),
@@ -148,6 +148,23 @@ INSERT INTO fact_sales (date_key, product_key, customer_key, quantity_sold, unit
 (20240215, 4, 2, 1, 29990.00, 2000.00, 27990.00),        -- Priya buys Headphones
 (20240215, 6, 12, 1, 55999.00, 7000.00, 48999.00);       -- Meera buys Camera (VIP discount)
 
+-- =====================================================
+-- 5. POPULATE ROLLUPS (month x product, month x customer)
+-- =====================================================
+-- Read by analytics_queries.sql instead of fact_sales.
+-- The ETL pipeline maintains them itself (rollups.py)
+-- =====================================================
+
+INSERT INTO agg_sales_month_product (month_key, product_key, total_amount, quantity_sold, sale_count)
+SELECT date_key DIV 100, product_key, SUM(total_amount), SUM(quantity_sold), COUNT(*)
+FROM fact_sales
+GROUP BY date_key DIV 100, product_key;
+
+INSERT INTO agg_sales_month_customer (month_key, customer_key, total_amount, quantity_sold, sale_count)
+SELECT date_key DIV 100, customer_key, SUM(total_amount), SUM(quantity_sold), COUNT(*)
+FROM fact_sales
+GROUP BY date_key DIV 100, customer_key;
+
 -- =====================================================
 -- VERIFICATION QUERIES
 -- =====================================================
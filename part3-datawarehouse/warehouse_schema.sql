@@ -31,7 +31,7 @@ CREATE TABLE dim_customer (
 );
 
 CREATE TABLE fact_sales (
-    sale_key INT PRIMARY KEY AUTO_INCREMENT,
+    sale_key BIGINT PRIMARY KEY AUTO_INCREMENT,
     date_key INT NOT NULL,
     product_key INT NOT NULL,
     customer_key INT NOT NULL,
@@ -44,3 +44,34 @@ CREATE TABLE fact_sales (
     FOREIGN KEY (customer_key) REFERENCES dim_customer(customer_key)
 );
 
+-- Rollups of fact_sales read by analytics_queries.sql
+-- month_key is YYYYMM (date_key DIV 100)
+CREATE TABLE agg_sales_month_product (
+    month_key INT NOT NULL,
+    product_key INT NOT NULL,
+    total_amount DECIMAL(15,2) NOT NULL,
+    quantity_sold BIGINT NOT NULL,
+    sale_count INT NOT NULL,
+    PRIMARY KEY (month_key, product_key)
+);
+
+CREATE TABLE agg_sales_month_customer (
+    month_key INT NOT NULL,
+    customer_key INT NOT NULL,
+    total_amount DECIMAL(15,2) NOT NULL,
+    quantity_sold BIGINT NOT NULL,
+    sale_count INT NOT NULL,
+    PRIMARY KEY (month_key, customer_key)
+);
+
+-- Secondary indexes (the ETL loader builds the same ones after its bulk
+-- load, see part1-database-etl/warehouse.py)
+-- Fact indexes lead with date_key and carry the measures, so month-range
+-- aggregations are answered from the index alone
+CREATE INDEX idx_fact_sales_date_product ON fact_sales (date_key, product_key, quantity_sold, total_amount);
+CREATE INDEX idx_fact_sales_date_customer ON fact_sales (date_key, customer_key, quantity_sold, total_amount);
+CREATE INDEX idx_fact_sales_product_key ON fact_sales (product_key);
+CREATE INDEX idx_fact_sales_customer_key ON fact_sales (customer_key);
+CREATE INDEX idx_agg_month_product_totals ON agg_sales_month_product (product_key, quantity_sold, total_amount);
+CREATE INDEX idx_agg_month_customer_totals ON agg_sales_month_customer (customer_key, quantity_sold, total_amount);
+